@@ -1,11 +1,18 @@
 import sys
+# python -m manageDS --profile: profiles every import and the startup up to the window being
+# ready, writing it to manageDS/profiler.stats
+if __name__ == '__main__' and '--profile' in sys.argv:
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+import pathlib
 import resources as r
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtCore import QThreadPool
 from functools import partial
-from .funcs.generalFuncs import extractIndices
 from .funcs.guiFuncs import add_items_list, add_items_combo
-from .funcs.visualisers import timedOut, viewSolvents, visualise_ds, prettyDisplay, printDBSelection
+from .funcs.populateFuncs import populate_indices
+from .funcs.visualisers import timedOut, viewSolvents, visualise_ds, prettyDisplay, printDBSelection, exportSelection
 from .funcs.pullFuncs import Runner
 from .funcs.dfManipulation import add_metajob, rem_metajob, add_fluorophore, rem_fluorophore, add_solvent, rem_solvent
 from .funcs.resetFuncs import resetDF
@@ -20,11 +27,6 @@ def reset_window(ui: Ui) -> None:
 def populate(ui: Ui) -> None:
     config = r.loadConfig()
     fluorophores, solvents, methods = r.fluorophores_solvents_methods()
-    with r.statusLoad('progress') as df:
-        metajobs = extractIndices(df)[3]
-
-    # general
-    add_items_list(ui.general_metajobs, metajobs)
 
     # selective results
     add_items_list(ui.select_fluorophores, [i for i in r.Fluorophores if (i.revised or i.gas)])
@@ -35,40 +37,8 @@ def populate(ui: Ui) -> None:
     add_items_combo(ui.ar_fluorophore_fluorophore, r.Fluorophores)
     add_items_combo(ui.ar_solvent_solvent, r.Solvents)
 
-    # selective results -> ex
-    with r.statusLoad(df='comp-ex') as df:
-        solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-    add_items_list(ui.select_ex_metajobs, metajobs)
-    add_items_list(ui.select_ex_states, states)
-    add_items_list(ui.select_ex_properties, properties)
-
-    # selective results -> em
-    with r.statusLoad(df='comp-em') as df:
-        solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-    add_items_list(ui.select_em_metajobs, metajobs)
-    add_items_list(ui.select_em_states, states)
-    add_items_list(ui.select_em_properties, properties)
-
-    # selective results -> freq
-    with r.statusLoad(df='comp-freq') as df:
-        solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-    add_items_list(ui.select_freq_metajobs, metajobs)
-    add_items_list(ui.select_freq_states, states)
-    add_items_list(ui.select_freq_properties, properties)
-
-    # selective results -> cas
-    with r.statusLoad(df='comp-casscf') as df:
-        solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-    add_items_list(ui.select_cas_metajobs, metajobs)
-    add_items_list(ui.select_cas_states, states)
-    add_items_list(ui.select_cas_properties, properties)
-
-    # selective results -> pol
-    with r.statusLoad(df='comp-pol') as df:
-        solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-    add_items_list(ui.select_pol_metajobs, metajobs)
-    add_items_list(ui.select_pol_states, states)
-    add_items_list(ui.select_pol_properties, properties)
+    # general metajobs and selective results
+    populate_indices(ui)
 
 def setup_progress(ui: Ui, total: int) -> None:
     ui.general_progressBar.setValue(0)
@@ -136,6 +106,7 @@ def connect(ui: Ui) -> None:
     ui.select_freq_button.clicked.connect(partial(printDBSelection, ui, 'comp-freq'))
     ui.select_cas_button.clicked.connect(partial(printDBSelection, ui, 'comp-casscf'))
     ui.select_pol_button.clicked.connect(partial(printDBSelection, ui, 'comp-pol'))
+    ui.select_export_button.clicked.connect(partial(exportSelection, ui))
 
     ui.ar_metajob_add.clicked.connect(partial(add_metajob, ui))
     ui.ar_metajob_remove.clicked.connect(partial(rem_metajob, ui))
@@ -153,5 +124,8 @@ if __name__ == '__main__':
     ui.threadpool = QThreadPool()
     populate(ui)
     connect(ui)
+    if '--profile' in sys.argv:
+        profiler.disable()
+        profiler.dump_stats(f'{pathlib.Path(__file__).parent.resolve()}/profiler.stats')
 
     sys.exit(app.exec())
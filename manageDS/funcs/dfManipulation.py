@@ -1,45 +1,39 @@
+import pandas as pd
 from .generalFuncs import extractIndices
 from .visualisers import prettyDisplay
 import resources as r
+from sharedFuncs.storeFuncs import framesLoad
 from .classes import Ui
 
-def add_metajob(ui: Ui) -> None:
-    metajob = ui.ar_metajob_metajob.currentData()
-
-    for db in ['progress', 'comp-freq', 'comp-em', 'comp-ex', 'comp-casscf', 'comp-pol']:
-        with r.statusLoad(df=db) as df:
-            if db == 'progress':
-                solvents, fluorophores, states, metajobs = extractIndices(df)
-                for fluorophores in fluorophores:
-                    for state in states:
-                        df.loc[(fluorophores, state, metajob), :] = None
-                        df.sort_index(inplace=True)
-            else:
-                solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-                if metajob.job == metajobs[0].job:
-                    for solvent in solvents:
-                        for fluorophore in fluorophores:
-                            for state in states:
-                                for prop in properties:
-                                    df.loc[(fluorophore, state, metajob, prop), solvent] = 0.0
-                                    df.sort_index(inplace=True)
-    if ui.ar_show.isChecked():
-        prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
+compFrames = ['comp-freq', 'comp-em', 'comp-ex', 'comp-casscf', 'comp-pol']
 
-def rem_metajob(ui: Ui) -> None:
-    metajob = ui.ar_metajob_metajob.currentData()
-    for ds in ['progress', 'comp-freq', 'comp-em', 'comp-ex', 'comp-casscf', 'comp-pol']:
-        with r.statusLoad(df=ds) as df:
-            try:
-                df = df.drop(index=metajob, level=2, inplace=True)
-            except AttributeError:
-                pass
-            except KeyError:
-                pass
-    if ui.ar_show.isChecked():
-        prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
+def addEntries(df: pd.DataFrame, level: int, values: list, initval) -> pd.DataFrame:
+    # adds every new value on index level `level` crossed with all existing values of the other
+    # levels in one concat and a single sort
+    lists = extractIndices(df)[1:]
+    lists[level] = [i for i in values if i not in lists[level]]
+    if len(lists[level]) == 0:
+        return df
+    index = pd.MultiIndex.from_product(lists, names=df.index.names)
+    # in the frame's own dtypes, so the concat doesn't turn a float frame into object
+    new = pd.DataFrame([[initval]*len(df.columns)]*len(index), index=index, columns=df.columns, dtype=object).astype(df.dtypes)
+    return pd.concat([df, new]).sort_index()
 
-def add_fluorophore(ui: Ui) -> None:
+def addColumns(df: pd.DataFrame, columns: list, initval) -> pd.DataFrame:
+    new = [i for i in columns if i not in df.columns]
+    if len(new) == 0:
+        return df
+    # new columns take the frame's dtype when all of its columns share one
+    dtype = df.dtypes.iloc[0] if len(df.columns) > 0 and df.dtypes.nunique() == 1 else object
+    return pd.concat([df, pd.DataFrame([[initval]*len(new)]*len(df.index), index=df.index, columns=new, dtype=object).astype(dtype)], axis=1)
+
+def removeEntries(df: pd.DataFrame, level: int, values: list) -> pd.DataFrame:
+    return df.drop(index=values, level=level, errors='ignore')
+
+def removeColumns(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    return df.drop(columns=columns, errors='ignore')
+
+def selected_dbs(ui: Ui) -> list[str]:
     dbList = []
     if ui.ar_energy.isChecked():
         dbList += ['dataset']
@@ -57,133 +51,68 @@ def add_fluorophore(ui: Ui) -> None:
         dbList += ['comp-casscf']
     if ui.ar_pol.isChecked():
         dbList += ['comp-pol']
+    return dbList
 
-    fluorophore = ui.ar_fluorophore_fluorophore.currentData()
-    for db in dbList:
-        initval = 0.0 if db in ['dataset'] else None
-        with r.statusLoad(df=db) as df:
-            if db == 'progress':
-                solvents, fluorophores, states, metajobs = extractIndices(df)
-                for state in states:
-                    for metajob in metajobs:
-                        df.loc[(fluorophore, state, metajob), :] = initval
-                        df.sort_index(inplace=True)
-            elif db in ['comp-freq', 'comp-em', 'comp-ex', 'comp-casscf', 'comp-pol']:
-                solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-                for state in states:
-                    for metajob in metajobs:
-                        for prop in properties:
-                            df.loc[(fluorophore, state, metajob, prop), :] = initval
-                            df.sort_index(inplace=True)
-            else:
-                solvents, fluorophores, inners = extractIndices(df)
-                for inner in inners:
-                    df.loc[(fluorophore, inner), :] = initval
-                    df.sort_index(inplace=True)
+def add_metajobs(metajobs: list[r.MetaJobs]) -> None:
+    with framesLoad(['progress'] + compFrames) as dfs:
+        dfs['progress'] = addEntries(dfs['progress'], 2, metajobs, None)
+        for db in compFrames:
+            frameMetajobs = extractIndices(dfs[db])[3]
+            dfs[db] = addEntries(dfs[db], 2, [i for i in metajobs if i.job == frameMetajobs[0].job], 0.0)
+
+def rem_metajobs(metajobs: list[r.MetaJobs]) -> None:
+    with framesLoad(['progress'] + compFrames) as dfs:
+        for db in dfs:
+            dfs[db] = removeEntries(dfs[db], 2, metajobs)
+
+def add_fluorophores(fluorophores: list[r.Fluorophores], dbList: list[str]) -> None:
+    with framesLoad(dbList) as dfs:
+        for db in dfs:
+            initval = 0.0 if db in ['dataset'] else None
+            dfs[db] = addEntries(dfs[db], 0, fluorophores, initval)
+
+def rem_fluorophores(fluorophores: list[r.Fluorophores], dbList: list[str]) -> None:
+    with framesLoad(dbList) as dfs:
+        for db in dfs:
+            dfs[db] = removeEntries(dfs[db], 0, fluorophores)
+
+def add_solvents(solvents: list[r.Solvents], dbList: list[str]) -> None:
+    with framesLoad(dbList) as dfs:
+        for db in dfs:
+            initval = 0.0 if db in ['dataset'] else None
+            dfs[db] = addColumns(dfs[db], solvents, initval)
+
+def rem_solvents(solvents: list[r.Solvents], dbList: list[str]) -> None:
+    with framesLoad(dbList) as dfs:
+        for db in dfs:
+            dfs[db] = removeColumns(dfs[db], solvents)
+
+def add_metajob(ui: Ui) -> None:
+    add_metajobs([ui.ar_metajob_metajob.currentData()])
     if ui.ar_show.isChecked():
         prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
 
-def rem_fluorophore(ui: Ui) -> None:
-    dbList = []
-    if ui.ar_energy.isChecked():
-        dbList += ['dataset']
-    if ui.ar_progress.isChecked():
-        dbList += ['progress']
-    if ui.ar_spectra.isChecked():
-        dbList += ['spectra']
-    if ui.ar_freq.isChecked():
-        dbList += ['comp-freq']
-    if ui.ar_em.isChecked():
-        dbList += ['comp-em']
-    if ui.ar_ex.isChecked():
-        dbList += ['comp-ex']
-    if ui.ar_cas.isChecked():
-        dbList += ['comp-casscf']
-    if ui.ar_pol.isChecked():
-        dbList += ['comp-pol']
+def rem_metajob(ui: Ui) -> None:
+    rem_metajobs([ui.ar_metajob_metajob.currentData()])
+    if ui.ar_show.isChecked():
+        prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
 
-    fluorophore = ui.ar_fluorophore_fluorophore.currentData()
-    for db in dbList:
-        with r.statusLoad(df=db) as df:
-            try:
-                df = df.drop(index=fluorophore, level=0, inplace=True)
-            except AttributeError:
-                pass
+def add_fluorophore(ui: Ui) -> None:
+    add_fluorophores([ui.ar_fluorophore_fluorophore.currentData()], selected_dbs(ui))
     if ui.ar_show.isChecked():
         prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
 
-def add_solvent(ui: Ui) -> None:
-    dbList = []
-    if ui.ar_energy.isChecked():
-        dbList += ['dataset']
-    if ui.ar_progress.isChecked():
-        dbList += ['progress']
-    if ui.ar_spectra.isChecked():
-        dbList += ['spectra']
-    if ui.ar_frerq.isChecked():
-        dbList += ['comp-freq']
-    if ui.ar_em.isChecked():
-        dbList += ['comp-em']
-    if ui.ar_ex.isChecked():
-        dbList += ['comp-ex']
-    if ui.ar_cas.isChecked():
-        dbList += ['comp-casscf']
-    if ui.ar_pol.isChecked():
-        dbList += ['comp-pol']
+def rem_fluorophore(ui: Ui) -> None:
+    rem_fluorophores([ui.ar_fluorophore_fluorophore.currentData()], selected_dbs(ui))
+    if ui.ar_show.isChecked():
+        prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
 
-    solvent = ui.ar_solvent_solvent.currentData()
-    for db in dbList:
-        initval = 0.0 if db in ['dataset'] else None
-        with r.statusLoad(df=db) as df:
-            if db == 'progress':
-                solvents, fluorophores, states, metajobs = extractIndices(df)
-                for fluorophore in fluorophores:
-                    for state in states:
-                        for metajob in metajobs:
-                            df.loc[(fluorophore, state, metajob), solvent] = initval
-                            df.sort_index(inplace=True)
-            elif db in ['comp-freq', 'comp-em', 'comp-ex', 'comp-casscf']:
-                solvents, fluorophores, states, metajobs, properties = extractIndices(df)
-                for fluorophore in fluorophores:
-                    for state in states:
-                        for metajob in metajobs:
-                            for prop in properties:
-                                df.loc[(fluorophore, state, metajob, prop), solvent] = initval
-                                df.sort_index(inplace=True)
-            else:
-                solvents, fluorophores, inners = extractIndices(df)
-                for fluorophore in fluorophores:
-                    for inner in inners:
-                        df.loc[(fluorophore, inner), solvent] = initval
-                        df.sort_index(inplace=True)
+def add_solvent(ui: Ui) -> None:
+    add_solvents([ui.ar_solvent_solvent.currentData()], selected_dbs(ui))
     if ui.ar_show.isChecked():
         prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
 
 def rem_solvent(ui: Ui) -> None:
-    dbList = []
-    if ui.ar_energy.isChecked():
-        dbList += ['dataset']
-    if ui.ar_progress.isChecked():
-        dbList += ['progress']
-    if ui.ar_spectra.isChecked():
-        dbList += ['spectra']
-    if ui.ar_frerq.isChecked():
-        dbList += ['comp-freq']
-    if ui.ar_em.isChecked():
-        dbList += ['comp-em']
-    if ui.ar_ex.isChecked():
-        dbList += ['comp-ex']
-    if ui.ar_cas.isChecked():
-        dbList += ['comp-casscf']
-    if ui.ar_pol.isChecked():
-        dbList += ['comp-pol']
-
-    solvent = ui.ar_solvent_solvent.currentData()
-    for db in dbList:
-        with r.statusLoad(df=db) as df:
-            try:
-                df = df.drop(solvent, axis=1, inplace=True)
-            except AttributeError:
-                pass
+    rem_solvents([ui.ar_solvent_solvent.currentData()], selected_dbs(ui))
     if ui.ar_show.isChecked():
         prettyDisplay(ui, full=True, uiOutput=ui.ar_output)
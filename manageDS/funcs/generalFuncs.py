@@ -1,10 +1,5 @@
-from pandas import DataFrame
+from sharedFuncs.indexFuncs import extractIndices
 
-def extractIndices(df: DataFrame) -> list[float]:
-    levels = len(df.index[0])
-    indexLists = [[] for i in range(levels)]
-    for row in df.index:
-        for count, level in enumerate(row):
-            if level not in indexLists[count]:
-                indexLists[count] += [level]
-    return [df.columns.to_list()] + indexLists
+def isMissing(x) -> bool:
+    # None in the pickled object frames, NaN once a frame comes back from the column store
+    return x is None or (isinstance(x, float) and x != x)
@@ -0,0 +1,55 @@
+import resources as r
+import numpy as np
+import pandas as pd
+
+def buildJobMatrix(fluorophores: list, solvents: list, metajobs: list, states: list, gasOnly: bool) -> pd.MultiIndex:
+    # every (fluorophore, state, metajob, solvent) a sweep should visit, ordered metajob -> state ->
+    # fluorophore -> solvent. built as one product of level codes and filtered with boolean masks:
+    #  - s0 needs a ground-state metajob, s1/s2 an excited-state one
+    #  - s2 is only run for fluorophores rooted in s2, the other states for the frame's fluorophores
+    #  - gas-only metajobs (and the gas toggle) restrict solvents to gas
+    #  - gas-phase-only fluorophores that are not revised never get a solvent
+    s2Fluorophores = [fluorophore for fluorophore in r.Fluorophores if (fluorophore.root == r.States.s2 and bool(fluorophore))]
+    allFluorophores = list(dict.fromkeys(list(fluorophores) + s2Fluorophores))
+    allSolvents = list(dict.fromkeys(list(solvents) + [r.Solvents.gas]))
+    levels = [list(metajobs), list(states), allFluorophores, allSolvents]
+    if min(len(level) for level in levels) == 0:
+        return pd.MultiIndex.from_tuples([], names=['Fluorophore', 'State', 'MetaJob', 'Solvent'])
+
+    m, s, f, v = [codes.ravel() for codes in np.meshgrid(*[np.arange(len(level)) for level in levels], indexing='ij')]
+
+    def attr(values: list, func) -> np.ndarray:
+        return np.array([bool(func(i)) for i in values], dtype=bool)
+
+    isS0 = attr(states, lambda x: x == r.States.s0)[s]
+    isS2 = attr(states, lambda x: x == r.States.s2)[s]
+    isGas = attr(allSolvents, lambda x: x == r.Solvents.gas)[v]
+    fluorophoreSet = set(fluorophores)
+    s2Set = set(s2Fluorophores)
+
+    mask = np.where(isS2, attr(allFluorophores, lambda x: x in s2Set)[f], attr(allFluorophores, lambda x: x in fluorophoreSet)[f])
+    mask &= ~isS0 | attr(metajobs, lambda x: x.gs)[m]
+    mask &= isS0 | attr(metajobs, lambda x: x.es)[m]
+    mask &= isGas | ~attr(metajobs, lambda x: x.gasonly)[m]
+    mask &= isGas | ~attr(allFluorophores, lambda x: x.gas and not x.revised)[f]
+    if gasOnly:
+        mask &= isGas
+
+    arrays = [objectArray(level)[codes[mask]] for level, codes in zip([allFluorophores, states, metajobs, allSolvents], [f, s, m, v])]
+    return pd.MultiIndex.from_arrays(arrays, names=['Fluorophore', 'State', 'MetaJob', 'Solvent'])
+
+def objectArray(values: list) -> np.ndarray:
+    # filled element-wise so tuple-like enum members are not unpacked into extra dimensions
+    out = np.empty(len(values), dtype=object)
+    for count, value in enumerate(values):
+        out[count] = value
+    return out
+
+def lookupCells(df: pd.DataFrame, rows: pd.MultiIndex, columns: list) -> np.ndarray:
+    # vectorised df.at[row, column] for paired rows/columns, None where either is missing
+    rowIdx = df.index.get_indexer(rows)
+    colIdx = df.columns.get_indexer(columns)
+    out = np.full(len(rowIdx), None, dtype=object)
+    found = (rowIdx >= 0) & (colIdx >= 0)
+    out[found] = df.to_numpy(dtype=object)[rowIdx[found], colIdx[found]]
+    return out
@@ -0,0 +1,48 @@
+from sharedFuncs.storeFuncs import indexSummary, refreshMeta
+from functools import partial
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+from .guiFuncs import add_items_list
+from .classes import Ui
+
+indexFrames = ['progress', 'comp-ex', 'comp-em', 'comp-freq', 'comp-casscf', 'comp-pol']
+
+class IndexSignals(QObject):
+    loaded = pyqtSignal(dict)
+
+class IndexRunner(QRunnable):
+    # loads the frames whose sidecar entries were stale, in parallel and off the GUI thread,
+    # bringing the sidecar up to date as it goes
+    def __init__(self, dfNames: list[str]):
+        super().__init__()
+        self.signals = IndexSignals()
+        self.dfNames = dfNames
+
+    def run(self) -> None:
+        self.signals.loaded.emit(refreshMeta(self.dfNames))
+
+def fill_indices(ui: Ui, indices: dict[str, list[list]]) -> None:
+    widgDict = {'comp-ex': [ui.select_ex_states, ui.select_ex_metajobs, ui.select_ex_properties],
+                'comp-em': [ui.select_em_states, ui.select_em_metajobs, ui.select_em_properties],
+                'comp-freq': [ui.select_freq_states, ui.select_freq_metajobs, ui.select_freq_properties],
+                'comp-casscf': [ui.select_cas_states, ui.select_cas_metajobs, ui.select_cas_properties],
+                'comp-pol': [ui.select_pol_states, ui.select_pol_metajobs, ui.select_pol_properties],
+                }
+    for dfName, frameIndices in indices.items():
+        if dfName == 'progress':
+            add_items_list(ui.general_metajobs, frameIndices[3])
+        else:
+            solvents, fluorophores, states, metajobs, properties = frameIndices
+            add_items_list(widgDict[dfName][0], states)
+            add_items_list(widgDict[dfName][1], metajobs)
+            add_items_list(widgDict[dfName][2], properties)
+
+def populate_indices(ui: Ui) -> None:
+    # lists filled straight from the metadata sidecar, with anything stale loaded in the background
+    indices = indexSummary(indexFrames)
+    fill_indices(ui, indices)
+    stale = [i for i in indexFrames if i not in indices]
+    if len(stale) > 0:
+        runner = IndexRunner(stale)
+        ui.indexSignals = runner.signals
+        ui.indexSignals.loaded.connect(partial(fill_indices, ui))
+        ui.threadpool.start(runner)
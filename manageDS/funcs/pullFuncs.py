@@ -1,9 +1,20 @@
 import resources as r
-from copy import deepcopy
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from contextlib import ExitStack
+from threading import Lock, Event
 from .generalFuncs import extractIndices
+from .statusFuncs import QueueSnapshot, fingerprintLoad
+from .matrixFuncs import buildJobMatrix, lookupCells
+from sharedFuncs.storeFuncs import framesLoad, statusLoad
+from sharedFuncs.clusterFuncs import ThreadHandlers, ClusterSession
+from sharedFuncs.resourceFuncs import features, recordUsage
 from PyQt6.QtCore import QRunnable, pyqtSlot, pyqtSignal, QObject
 from socket import gaierror
 
+# upper bound on simultaneous checkJobStatus/pullJobEnergy calls against a single cluster
+maxInFlight = 4
+
 class WorkerSignals(QObject):
     setup = pyqtSignal(int)
     progress = pyqtSignal(int)
@@ -15,9 +26,10 @@ class WorkerSignals(QObject):
 class Runner(QRunnable):
     signals = WorkerSignals()
 
-    def __init__(self, ui):
+    def __init__(self, ui, handler=None):
         super().__init__()
         self.ui = ui
+        self.handler = r.clusterHandler if handler == None else handler
         self.shutdownCheck = False
 
     @pyqtSlot()
@@ -51,44 +63,19 @@ class Runner(QRunnable):
             stateList += [r.States.s2]
 
         if self.ui.general_progress.isChecked():
-            with r.statusLoad(df='progress') as df:
-                solvents, fluorophores, states, metajobs = extractIndices(df)
+            with statusLoad(df='progress') as df:
+                jobList = self.progress_jobs(df, stateList)
+                if self.ui.general_concurrent.isChecked():
+                    self.poll_concurrent(df, clusters, jobList)
+                    return
                 for cluster_choice in clusters:
                     try:
-                        with r.clusterHandler(cluster_choice) as clu:
-                            jobList = []
+                        with ClusterSession(cluster_choice, self.handler) as clu:
                             cluster = r.loadRemotes(cluster_choice)
-                            metajobs = [i.data(1) for i in self.ui.general_metajobs.selectedItems()]
-                            for metajob in metajobs:
-                                states = deepcopy(stateList)
-                                if not metajob.gs:
-                                    try:
-                                        states.remove(r.States.s0)
-                                    except ValueError:
-                                        pass
-                                if not metajob.es:
-                                    try:
-                                        states.remove(r.States.s1)
-                                    except ValueError:
-                                        pass
-                                    try:
-                                        states.remove(r.States.s2)
-                                    except ValueError:
-                                        pass
-                                for state in states:
-                                    if state == r.States.s2:
-                                        fluorophores = [fluorophore for fluorophore in r.Fluorophores if (fluorophore.root == r.States.s2 and bool(fluorophore))]
-                                    else:
-                                        _, fluorophores, _, _ = extractIndices(df)
-                                    for fluorophore in fluorophores:
-                                        solventList = [r.Solvents.gas] if metajob.gasonly else solvents + [r.Solvents.gas]
-                                        for solvent in solventList:
-                                            if (self.ui.general_gas.isChecked() and solvent == r.Solvents.gas) or not self.ui.general_gas.isChecked():
-                                                if (fluorophore.gas) and (not fluorophore.revised) and (solvent != r.Solvents.gas):
-                                                    pass
-                                                else:
-                                                    jobList += [(fluorophore, state, metajob, solvent)]
-
+                            jobs = {(fluorophore, state, metajob, solvent): r.Job.from_MetaJob(metajob, fluorophore, solvent, state, cluster=cluster)
+                                    for fluorophore, state, metajob, solvent in jobList
+                                    if (df.at[(fluorophore, state, metajob), solvent] != r.Status.finished) or self.ui.general_full.isChecked()}
+                            snapshot = QueueSnapshot.from_session(clu, self.ui.general_bulk.isChecked(), list(jobs.values()))
                             self.signals.setup.emit(len(jobList))
                             for count, (fluorophore, state, metajob, solvent) in enumerate(jobList):
                                 count += 1
@@ -96,10 +83,9 @@ class Runner(QRunnable):
                                     return
                                 self.signals.status.emit(f'Checking {metajob} of {state} {fluorophore} in {solvent} from {cluster.cluster}')
                                 self.signals.progress.emit(count)
-                                status = df.at[(fluorophore, state, metajob), solvent]
-                                if (status != r.Status.finished) or self.ui.general_full.isChecked():
-                                    job = r.Job.from_MetaJob(metajob, fluorophore, solvent, state, cluster=cluster)
-                                    status = clu.checkJobStatus(job)
+                                if (fluorophore, state, metajob, solvent) in jobs:
+                                    job = jobs[(fluorophore, state, metajob, solvent)]
+                                    status = snapshot.resolve(clu, job) if snapshot != None else clu.checkJobStatus(job)
                                     if self.ui.general_reset.isChecked() or status != None:
                                         df.at[(fluorophore, state, metajob), solvent] = status
                     except gaierror:
@@ -107,6 +93,76 @@ class Runner(QRunnable):
                         self.shutdownCheck = True
                         return
 
+    def progress_jobs(self, df, stateList: list) -> pd.MultiIndex:
+        solvents, fluorophores, _, _ = extractIndices(df)
+        metajobs = [i.data(1) for i in self.ui.general_metajobs.selectedItems()]
+        return buildJobMatrix(fluorophores, solvents, metajobs, stateList, self.ui.general_gas.isChecked())
+
+    def poll_concurrent(self, df, clusters: list, jobList: pd.MultiIndex) -> None:
+        # one worker per cluster, each running up to maxInFlight status checks at once.
+        # results are only written back to df here, in cluster order, so the outcome
+        # matches the serial sweep and progress is committed once when statusLoad exits
+        full = self.ui.general_full.isChecked()
+        reset = self.ui.general_reset.isChecked()
+        toCheck = list(jobList)
+        if not full and len(jobList) > 0:
+            toCheck = list(jobList[lookupCells(df, jobList.droplevel('Solvent'), jobList.get_level_values('Solvent')) != r.Status.finished])
+
+        self.counter = 0
+        self.counterLock = Lock()
+        self.signals.setup.emit(len(toCheck)*len(clusters))
+        with ThreadPoolExecutor(max_workers=max(len(clusters), 1)) as pool:
+            futures = [pool.submit(self.poll_cluster, cluster_choice, toCheck) for cluster_choice in clusters]
+            results = [future.result() for future in futures]
+
+        for clusterResults, socketError in results:
+            for (fluorophore, state, metajob, solvent), status in clusterResults.items():
+                if (df.at[(fluorophore, state, metajob), solvent] != r.Status.finished) or full:
+                    if reset or status != None:
+                        df.at[(fluorophore, state, metajob), solvent] = status
+
+        if any(socketError for _, socketError in results):
+            self.signals.socketError.emit()
+            self.shutdownCheck = True
+
+    def poll_cluster(self, cluster_choice, jobList: list[tuple]) -> tuple[dict, bool]:
+        cluster = r.loadRemotes(cluster_choice)
+        results = {}
+        jobs = {(fluorophore, state, metajob, solvent): r.Job.from_MetaJob(metajob, fluorophore, solvent, state, cluster=cluster)
+                for fluorophore, state, metajob, solvent in jobList}
+
+        def check(handlers: ThreadHandlers, fluorophore, state, metajob, solvent):
+            if self.shutdownCheck:
+                return
+            self.signals.status.emit(f'Checking {metajob} of {state} {fluorophore} in {solvent} from {cluster.cluster}')
+            job = jobs[(fluorophore, state, metajob, solvent)]
+            clu = handlers.get()
+            results[(fluorophore, state, metajob, solvent)] = snapshot.resolve(clu, job) if snapshot != None else clu.checkJobStatus(job)
+            self.step()
+
+        socketError = False
+        with ThreadHandlers(self.handler, cluster_choice) as handlers:
+            try:
+                snapshot = QueueSnapshot.from_session(handlers.get(), self.ui.general_bulk.isChecked(), list(jobs.values()))
+            except gaierror:
+                self.shutdownCheck = True
+                return results, True
+            with ThreadPoolExecutor(max_workers=maxInFlight) as pool:
+                futures = [pool.submit(check, handlers, *job) for job in jobList]
+                for future in futures:
+                    try:
+                        future.result()
+                    except gaierror:
+                        socketError = True
+                        self.shutdownCheck = True
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        break
+        return results, socketError
+
+    def step(self) -> None:
+        with self.counterLock:
+            self.counter += 1
+            self.signals.progress.emit(self.counter)
 
     def pull_results(self) -> None:
         clusters = []
@@ -137,110 +193,181 @@ class Runner(QRunnable):
         if self.ui.general_pol.isChecked():
             dfList += ['comp-pol']
 
-        for dfName in dfList:
-            with r.statusLoad(df=dfName) as df:
-                with r.statusLoad(df="progress") as df_progress:
-                    solvents, fluorophores, _, metajobs, properties = extractIndices(df)
-                    for cluster_choice in clusters:
-                        with r.clusterHandler(cluster_choice) as clu:
-                            cluster = r.loadRemotes(cluster_choice)
-                            for metajob in metajobs:
-                                if metajob in [i.data(1) for i in self.ui.general_metajobs.selectedItems()]:
-                                    states = deepcopy(stateList)
-                                    if not metajob.gs:
-                                        try:
-                                            states.remove(r.States.s0)
-                                        except ValueError:
-                                            pass
-                                    if not metajob.es:
-                                        try:
-                                            states.remove(r.States.s1)
-                                        except ValueError:
-                                            pass
-                                        try:
-                                            states.remove(r.States.s2)
-                                        except ValueError:
-                                            pass
-                                    for state in states:
-                                        if state == r.States.s2:
-                                            fluorophores = [fluorophore for fluorophore in r.Fluorophores if (fluorophore.root == r.States.s2 and bool(fluorophore))]
-                                        else:
-                                            _, fluorophores, _, _, _ = extractIndices(df)
-                                        for fluorophore in fluorophores:
-                                            solventList = [r.Solvents.gas] if metajob.gasonly else solvents + [r.Solvents.gas]
-                                            for solvent in solventList:
-                                                if (self.ui.general_gas.isChecked() and solvent == r.Solvents.gas) or not self.ui.general_gas.isChecked():
-                                                    if (fluorophore.gas) and (not fluorophore.revised) and (solvent != r.Solvents.gas):
-                                                        pass
-                                                    else:
-                                                        if df_progress.at[(fluorophore, state, metajob), solvent] == r.Status.finished:
-                                                            status = df.at[(fluorophore, state, metajob, properties[0]), solvent]
-                                                            if status in [0.0, None] or status == None or self.ui.general_full.isChecked():
-                                                                self.signals.status.emit(f'Pulling {metajob} of {state} {fluorophore} in {solvent} from {cluster.cluster}')
-                                                                job = r.Job.from_MetaJob(metajob, fluorophore, solvent, state, cluster=cluster)
-                                                                if dfName == 'comp-casscf':
-                                                                    try:
-                                                                        e, e_trans, f, t, m = clu.pullJobEnergy(job)
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.CASSCF.de), solvent] = e
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.CASSCF.m), solvent] = m
-
-                                                                        for e_t, i in zip(e_trans, [i for i in r.Energy.CASSCF if 'e_s0' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = e_t
-
-                                                                        for f_t, i in zip(f, [i for i in r.Energy.CASSCF if 'f_s0' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = f_t
-
-                                                                        for t_t, i in zip(t, [i for i in r.Energy.CASSCF if 't_s0' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = t_t
-                                                                    except TypeError:
-                                                                        pass
-
-                                                                if dfName == 'comp-pol':
-                                                                    try:
-                                                                        iso, diag, pol = clu.pullJobEnergy(job)
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Polarisability.iso), solvent] = iso
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Polarisability.pol), solvent] = pol
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Polarisability.diag), solvent] = diag
-                                                                    except TypeError:
-                                                                        pass
-
-                                                                if dfName == 'comp-ex':
-                                                                    try:
-                                                                        e, e_trans, f, t = clu.pullJobEnergy(job)
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Excitation.de), solvent] = e
-
-                                                                        for e_t, i in zip(e_trans, [i for i in r.Energy.Excitation if 'e_s0' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = e_t
-
-                                                                        for f_t, i in zip(f, [i for i in r.Energy.Excitation if 'f_s0' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = f_t
-
-                                                                        for t_t, i in zip(t, [i for i in r.Energy.Excitation if 't_s0' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = t_t
-                                                                    except TypeError:
-                                                                        pass
-
-                                                                if dfName == 'comp-em':
-                                                                    try:
-                                                                        e, e_trans, f, t = clu.pullJobEnergy(job)
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Emission.de), solvent] = e
-
-                                                                        for e_t, i in zip(e_trans, [i for i in r.Energy.Emission if 'e_s' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = e_t
-
-                                                                        for f_t, i in zip(f, [i for i in r.Energy.Emission if 'f_s' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = f_t
-
-                                                                        for t_t, i in zip(t, [i for i in r.Energy.Emission if 't_s' in i.name]):
-                                                                            df.at[(fluorophore, state, metajob, i), solvent] = t_t
-                                                                    except TypeError:
-                                                                        pass
-
-                                                                if dfName == 'comp-freq':
-                                                                    try:
-                                                                        e, zpve, neg = clu.pullJobEnergy(job)
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Freq.de), solvent] = e
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Freq.zpve), solvent] = zpve
-                                                                        df.at[(fluorophore, state, metajob, r.Energy.Freq.neg), solvent] = neg
-                                                                    except TypeError:
-                                                                        pass
+        if len(dfList) == 0:
+            return
+
+        # producer -> pool of fetch workers -> single writer (this thread). each cluster
+        # is visited once for all of the frames, which are written back together once
+        # that cluster is done, so a failure only costs the cluster it happened on. a
+        # job that fails is reported and left out. frames held in the column store are only
+        # loaded for the selected states and metajobs
+        workers = maxInFlight if self.ui.general_concurrent.isChecked() else 1
+        incremental = self.ui.general_incremental.isChecked()
+        metajobs = [i.data(1) for i in self.ui.general_metajobs.selectedItems()]
+        rows = {dfName: {'State': stateList, 'MetaJob': metajobs} for dfName in dfList}
+        for cluster_choice in clusters:
+            if self.shutdownCheck:
+                return
+            cluster = r.loadRemotes(cluster_choice)
+            with ExitStack() as stack:
+                fingerprints = {dfName: stack.enter_context(fingerprintLoad(dfName)) for dfName in dfList}
+                frames = stack.enter_context(framesLoad(dfList + ['progress'], rows))
+                dfs = {dfName: frames[dfName] for dfName in dfList}
+                df_progress = frames['progress']
+                usage = []
+                stack.callback(recordUsage, usage)
+                workList, filled = self.pull_jobs(dfs, df_progress, stateList, metajobs)
+                self.signals.setup.emit(len(workList))
+                # set by the first worker that finds it can't fingerprint outputs on this cluster
+                unfingerprinted = Event()
+
+                def fetch(handlers: ThreadHandlers, dfName: str, fluorophore, state, metajob, solvent):
+                    # returns (energy, fingerprint, skipped, job)
+                    if self.shutdownCheck:
+                        return None, None, True, None
+                    job = r.Job.from_MetaJob(metajob, fluorophore, solvent, state, cluster=cluster)
+                    clu = handlers.get()
+                    fingerprint = None
+                    if incremental and not unfingerprinted.is_set():
+                        try:
+                            fingerprint = clu.outputFingerprint(job)
+                        except NotImplementedError:
+                            unfingerprinted.set()
+                        stored = fingerprints[dfName].get((fluorophore, state, metajob, solvent))
+                        if fingerprint != None and fingerprint == stored and (dfName, fluorophore, state, metajob, solvent) in filled:
+                            return None, fingerprint, True, job
+                    self.signals.status.emit(f'Pulling {metajob} of {state} {fluorophore} in {solvent} from {cluster.cluster}')
+                    return clu.pullJobEnergy(job), fingerprint, False, job
+
+                with ThreadHandlers(self.handler, cluster_choice) as handlers:
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        futures = {pool.submit(fetch, handlers, *item): item for item in workList}
+                        pulled = []
+                        reported = False
+                        for count, future in enumerate(as_completed(futures), start=1):
+                            dfName, fluorophore, state, metajob, solvent = futures[future]
+                            if unfingerprinted.is_set() and not reported:
+                                self.signals.status.emit(f'Incremental pull unavailable on {cluster.cluster}: its handler cannot run commands, pulling every job')
+                                reported = True
+                            try:
+                                energy, fingerprint, skipped, job = future.result()
+                                if not skipped:
+                                    self.store_energy(dfs, dfName, fluorophore, state, metajob, solvent, energy)
+                                    if energy != None:
+                                        pulled += [(job, fluorophore, state, metajob, solvent)]
+                                    if fingerprint != None and energy != None:
+                                        fingerprints[dfName][(fluorophore, state, metajob, solvent)] = fingerprint
+                            except gaierror:
+                                self.shutdownCheck = True
+                                pool.shutdown(wait=False, cancel_futures=True)
+                                self.signals.socketError.emit()
+                                return
+                            except Exception as e:
+                                self.signals.status.emit(f'Pulling {metajob} of {state} {fluorophore} in {solvent} from {cluster.cluster} failed: {e}')
+                            self.signals.progress.emit(count)
+                        if len(pulled) > 0 and not self.shutdownCheck:
+                            usage += self.pulled_usage(pool.submit(lambda: handlers.get().usageHistory()), pulled, cluster)
+
+    def pulled_usage(self, listing: Future, pulled: list[tuple], cluster) -> list[dict]:
+        # what the pulled jobs used, for metajobBuilder's resource estimates, from one accounting
+        # listing per cluster. only best effort: the results pulled are kept whatever goes wrong here
+        try:
+            history = listing.result()
+            return [{'fluorophore': fluorophore, 'state': state, 'metajob': metajob, 'solvent': solvent,
+                     **features(job, fluorophore, metajob, solvent), **history[job.name]}
+                    for job, fluorophore, state, metajob, solvent in pulled if job.name in history]
+        except Exception as e:
+            self.signals.status.emit(f'Resource usage from {cluster.cluster} not recorded: {e}')
+            return []
+
+    def pull_jobs(self, dfs: dict, df_progress, stateList: list, selectedMetajobs: list) -> tuple[list[tuple], set[tuple]]:
+        # the jobs to pull, and which of them already have results. both are worked out here, on
+        # the writer's thread, as the workers mustn't read the frames it is writing to
+        workList, filled = [], set()
+        for dfName, df in dfs.items():
+            solvents, fluorophores, _, metajobs, properties = extractIndices(df)
+            matrix = buildJobMatrix(fluorophores, solvents, [i for i in metajobs if i in selectedMetajobs], stateList, self.ui.general_gas.isChecked())
+            if len(matrix) == 0:
+                continue
+            jobSolvents = matrix.get_level_values('Solvent')
+            jobs = matrix.droplevel('Solvent')
+            finished = lookupCells(df_progress, jobs, jobSolvents) == r.Status.finished
+            first = lookupCells(df, pd.MultiIndex.from_tuples([job + (properties[0],) for job in jobs]), jobSolvents)
+            empty = pd.isna(first) | (first == 0.0)
+            if not self.ui.general_full.isChecked():
+                finished &= empty
+            workList += [(dfName,) + job for job in matrix[finished]]
+            filled |= {(dfName,) + job for job in matrix[finished & ~empty]}
+        return workList, filled
+
+    def store_energy(self, dfs: dict, dfName: str, fluorophore, state, metajob, solvent, energy) -> None:
+        df = dfs[dfName]
+        if df[solvent].dtype != object:
+            # dipoles and polarisabilities are tuples, which a float column can't hold
+            df[solvent] = df[solvent].astype(object)
+        if dfName == 'comp-casscf':
+            try:
+                e, e_trans, f, t, m = energy
+                df.at[(fluorophore, state, metajob, r.Energy.CASSCF.de), solvent] = e
+                df.at[(fluorophore, state, metajob, r.Energy.CASSCF.m), solvent] = m
+
+                for e_t, i in zip(e_trans, [i for i in r.Energy.CASSCF if 'e_s0' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = e_t
+
+                for f_t, i in zip(f, [i for i in r.Energy.CASSCF if 'f_s0' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = f_t
+
+                for t_t, i in zip(t, [i for i in r.Energy.CASSCF if 't_s0' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = t_t
+            except TypeError:
+                pass
+
+        if dfName == 'comp-pol':
+            try:
+                iso, diag, pol = energy
+                df.at[(fluorophore, state, metajob, r.Energy.Polarisability.iso), solvent] = iso
+                df.at[(fluorophore, state, metajob, r.Energy.Polarisability.pol), solvent] = pol
+                df.at[(fluorophore, state, metajob, r.Energy.Polarisability.diag), solvent] = diag
+            except TypeError:
+                pass
+
+        if dfName == 'comp-ex':
+            try:
+                e, e_trans, f, t = energy
+                df.at[(fluorophore, state, metajob, r.Energy.Excitation.de), solvent] = e
+
+                for e_t, i in zip(e_trans, [i for i in r.Energy.Excitation if 'e_s0' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = e_t
+
+                for f_t, i in zip(f, [i for i in r.Energy.Excitation if 'f_s0' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = f_t
+
+                for t_t, i in zip(t, [i for i in r.Energy.Excitation if 't_s0' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = t_t
+            except TypeError:
+                pass
+
+        if dfName == 'comp-em':
+            try:
+                e, e_trans, f, t = energy
+                df.at[(fluorophore, state, metajob, r.Energy.Emission.de), solvent] = e
+
+                for e_t, i in zip(e_trans, [i for i in r.Energy.Emission if 'e_s' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = e_t
+
+                for f_t, i in zip(f, [i for i in r.Energy.Emission if 'f_s' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = f_t
+
+                for t_t, i in zip(t, [i for i in r.Energy.Emission if 't_s' in i.name]):
+                    df.at[(fluorophore, state, metajob, i), solvent] = t_t
+            except TypeError:
+                pass
+
+        if dfName == 'comp-freq':
+            try:
+                e, zpve, neg = energy
+                df.at[(fluorophore, state, metajob, r.Energy.Freq.de), solvent] = e
+                df.at[(fluorophore, state, metajob, r.Energy.Freq.zpve), solvent] = zpve
+                df.at[(fluorophore, state, metajob, r.Energy.Freq.neg), solvent] = neg
+            except TypeError:
+                pass
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from sharedFuncs import columnStore
+from sharedFuncs.storeFuncs import readFrame, frameVersion
+from .generalFuncs import isMissing
+
+# {dfName: (version, frame, numeric frame)} for the pickled frames. the numeric frame holds a float
+# for every cell of a comp-* frame, with vector-valued properties (transition dipoles,
+# polarisability tensors) reduced to their norm, so selections don't have to convert cell by cell
+# each time. frames in the column store already hold the norms and are read per selection
+queryCache = {}
+
+def isVector(x) -> bool:
+    return isinstance(x, (tuple, list, np.ndarray))
+
+def numericFrame(df: pd.DataFrame) -> pd.DataFrame:
+    values = df.to_numpy(dtype=object)
+    numeric = np.array([np.linalg.norm(np.array(x, dtype=float)) if isVector(x) else np.nan if isMissing(x) else float(x) for x in values.ravel()], dtype=float)
+    return pd.DataFrame(numeric.reshape(values.shape), index=df.index, columns=df.columns)
+
+def queryFrames(dfName: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    version = frameVersion(dfName)
+    if dfName not in queryCache or queryCache[dfName][0] != version:
+        df = readFrame(dfName)
+        queryCache[dfName] = (version, df, numericFrame(df))
+    return queryCache[dfName][1:]
+
+def query(dfName: str, fluorophores: list, states: list, metajobs: list, properties: list, solvents: list, norms: bool = True) -> pd.DataFrame:
+    # every selected property at once. the column store reads just the selected rows and solvents,
+    # pickled frames are masked on the index levels. with norms the values are the precomputed
+    # floats, otherwise the cells as stored
+    if columnStore.isStored(dfName):
+        rows = dict(zip(['Fluorophore', 'State', 'MetaJob', 'Property'], [fluorophores, states, metajobs, properties]))
+        return columnStore.readFrame(dfName, rows, solvents, vectors=not norms)
+    df, numeric = queryFrames(dfName)
+    source = numeric if norms else df
+    mask = np.ones(len(df.index), dtype=bool)
+    for level, values in enumerate([fluorophores, states, metajobs, properties]):
+        mask &= df.index.get_level_values(level).isin(values)
+    return source.loc[mask, [i for i in df.columns if i in solvents]]
+
+def exportQuery(df: pd.DataFrame, path: str) -> None:
+    # enums are written by name, and vectors that weren't reduced to norms as text
+    out = df.copy()
+    out.index = pd.MultiIndex.from_arrays([out.index.get_level_values(i).map(str) for i in range(out.index.nlevels)], names=out.index.names)
+    out.columns = [str(i) for i in out.columns]
+    for column in out.columns:
+        if out[column].dtype == object:
+            out[column] = out[column].map(lambda x: None if isMissing(x) else str(x))
+    if path.endswith('.parquet'):
+        out.to_parquet(path)
+    else:
+        out.to_csv(path)
@@ -1,31 +1,40 @@
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad, storeFrames, readFrame
 import pandas as pd
 import numpy as np
+from .generalFuncs import isMissing
 from .classes import Ui
 
 fluorophores, solvents, methods = r.fluorophores_solvents_methods()
-config = r.loadConfig()
 
-def make_multindex(cols: list[str], iterables: list, levelLabels: list[str], dfName: str, initValue, astype: type) -> None:
-    rows = 1
-    for inner in iterables:
-        rows = rows * len(inner)
+def make_multindex(cols: list[str], iterables: list, levelLabels: list[str], dfName: str, initValue, astype: type, reshape: bool = False) -> None:
     index = pd.MultiIndex.from_product(iterables, names=levelLabels)
-    df = pd.DataFrame(np.full((rows, len(cols)), initValue), columns=cols, index=index)
-    df.astype(astype)
-    df.to_pickle(f'{config.local.dbLocationMac}/{dfName}')
+    values = np.full((len(index), len(cols)), initValue)
+    if reshape:
+        # keeps every value whose row and column are still in the new schema, so only the
+        # added entries need pulling
+        try:
+            old = readFrame(dfName)
+        except FileNotFoundError:
+            old = None
+        if old is not None:
+            kept = index.isin(old.index)[:, None] & pd.Index(cols).isin(old.columns)[None, :]
+            values = np.where(kept, old.reindex(index=index, columns=cols).to_numpy(dtype=object), values)
+    df = pd.DataFrame(values, columns=cols, index=index).astype(astype)
+    storeFrames({dfName: df})
 
 def resetDF(ui: Ui) -> None:
     ui.general_output.clear()
     fluorophores, solvents, methods = r.fluorophores_solvents_methods()
+    reshape = ui.resetWindow.reset_reshape.isChecked()
     if ui.resetWindow.reset_spectra.isChecked():
         make_multindex([i for i in r.Solvents if i.ds],
                        [[i for i in r.Fluorophores if i.experimental],
                            list(r.spectraType)],
                        ['Fluorophore', 'Spectrum'],
                        'spectra',
-                       None, object)
-        with r.statusLoad('spectra') as df:
+                       None, object, reshape)
+        with statusLoad('spectra') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Spectra</h2>')
             dfOut = df.notnull().style.applymap(lambda x: 'color : blue' if x else 'color : red').to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
@@ -36,10 +45,10 @@ def resetDF(ui: Ui) -> None:
                         ['a', 'a_g', 'e', 'e_g', 'zz', 'zz_g', 'qy', 'fl1-t', 'fl1-c', 'fl2-t', 'fl2-c']],
                        ['Fluorophore', 'Energy'],
                        'dataset',
-                       0.0, object)
-        with r.statusLoad('dataset') as df:
+                       0.0, object, reshape)
+        with statusLoad('dataset') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Energy</h2>')
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
+            dfOut = df.style.applymap(lambda x: 'color : red' if isMissing(x) else 'color : blue').format(precision=3).to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
 
     if ui.resetWindow.reset_progress.isChecked():
@@ -49,8 +58,8 @@ def resetDF(ui: Ui) -> None:
                         [i for i in r.MetaJobs if i.used]],
                        ['Fluorophore', 'State', 'MetaJob'],
                        'progress',
-                       None, object)
-        with r.statusLoad('progress') as df:
+                       None, object, reshape)
+        with statusLoad('progress') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Progress</h2>')
             dfOut = df.notnull().style.applymap(lambda x: 'color : blue' if x else 'color : red').to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
@@ -63,10 +72,10 @@ def resetDF(ui: Ui) -> None:
                         [i for i in r.Energy.Freq]],
                        ['Fluorophore', 'State', 'MetaJob', 'Property'],
                        'comp-freq',
-                       None, object)
-        with r.statusLoad('comp-freq') as df:
+                       None, object, reshape)
+        with statusLoad('comp-freq') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Frequencies</h2>')
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
+            dfOut = df.style.applymap(lambda x: 'color : red' if isMissing(x) else 'color : blue').format(precision=3).to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
 
     if ui.resetWindow.reset_em.isChecked():
@@ -77,10 +86,10 @@ def resetDF(ui: Ui) -> None:
                         [i for i in r.Energy.Emission]],
                        ['Fluorophore', 'State', 'MetaJob', 'Property'],
                        'comp-em',
-                       None, object)
-        with r.statusLoad('comp-em') as df:
+                       None, object, reshape)
+        with statusLoad('comp-em') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Emission</h2>')
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
+            dfOut = df.style.applymap(lambda x: 'color : red' if isMissing(x) else 'color : blue').format(precision=3).to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
 
     if ui.resetWindow.reset_ex.isChecked():
@@ -91,10 +100,10 @@ def resetDF(ui: Ui) -> None:
                         [i for i in r.Energy.Excitation]],
                        ['Fluorophore', 'State', 'MetaJob', 'Property'],
                        'comp-ex',
-                       None, object)
-        with r.statusLoad('comp-ex') as df:
+                       None, object, reshape)
+        with statusLoad('comp-ex') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Excitation</h2>')
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
+            dfOut = df.style.applymap(lambda x: 'color : red' if isMissing(x) else 'color : blue').format(precision=3).to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
 
     if ui.resetWindow.reset_cas.isChecked():
@@ -105,10 +114,10 @@ def resetDF(ui: Ui) -> None:
                         [i for i in r.Energy.CASSCF]],
                        ['Fluorophore', 'State', 'MetaJob', 'Property'],
                        'comp-casscf',
-                       None, object)
-        with r.statusLoad('comp-casscf') as df:
+                       None, object, reshape)
+        with statusLoad('comp-casscf') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>CAS</h2>')
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
+            dfOut = df.style.applymap(lambda x: 'color : red' if isMissing(x) else 'color : blue').format(precision=3).to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
 
     if ui.resetWindow.reset_pol.isChecked():
@@ -119,8 +128,8 @@ def resetDF(ui: Ui) -> None:
                         [i for i in r.Energy.Polarisability]],
                        ['Fluorophore', 'State', 'MetaJob', 'Property'],
                        'comp-pol',
-                       None, object)
-        with r.statusLoad('comp-pol') as df:
+                       None, object, reshape)
+        with statusLoad('comp-pol') as df:
             ui.general_output.setHtml(ui.general_output.toHtml() + '<h2>Polarisabilities</h2>')
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
+            dfOut = df.style.applymap(lambda x: 'color : red' if isMissing(x) else 'color : blue').format(precision=3).to_html(max_rows=100)
             ui.general_output.setHtml(ui.general_output.toHtml() + dfOut)
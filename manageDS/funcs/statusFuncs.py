@@ -0,0 +1,65 @@
+import os
+import pickle
+import resources as r
+from sharedFuncs.bundleFuncs import readBundles, pruneBundles
+
+class QueueSnapshot:
+    # a single-pass view of what a cluster's scheduler holds and which outputs have finished, keyed
+    # by job name. jobs still in the queue, directly or through the bundle they were packed into,
+    # take its state over any stale output from a previous run; then jobs with a normally
+    # terminated output are finished; the rest (failed, timed out or never run) go to the
+    # handler's per-job check of their output
+    def __init__(self, queue: dict[str, r.Status], bundles: dict[str, str] = None, finished: set[str] = None):
+        self.queue = queue
+        self.bundles = {} if bundles == None else bundles
+        self.finished = set() if finished == None else finished
+
+    @classmethod
+    def from_session(cls, clu, bulk: bool, jobs: list[r.Job] = ()) -> 'QueueSnapshot | None':
+        # taken when asked for, or when there are bundles whose members only the queue can place.
+        # a bulk snapshot also lists which of jobs have finished, in one pass over their outputs.
+        # None leaves every job to checkJobStatus, as does a cluster whose queue can't be listed
+        if not bulk and len(readBundles(clu.cluster_choice)) == 0:
+            return None
+        try:
+            queue = clu.queueStatus()
+        except NotImplementedError:
+            return None
+        snapshot = cls(queue, pruneBundles(clu.cluster_choice, queue))
+        if bulk:
+            snapshot.finished = clu.finishedJobs([job for job in jobs if not snapshot.queued(job)])
+        return snapshot
+
+    def queued(self, job: r.Job) -> bool:
+        return job.name in self.queue or self.bundles.get(job.name) in self.queue
+
+    def resolve(self, clu, job: r.Job) -> r.Status | None:
+        if job.name in self.queue:
+            return self.queue[job.name]
+        if self.bundles.get(job.name) in self.queue:
+            return self.queue[self.bundles[job.name]]
+        if job.name in self.finished:
+            return r.Status.finished
+        return clu.checkJobStatus(job)
+
+class fingerprintLoad:
+    # sidecar next to a stored frame holding the remote output fingerprint (e.g. mtime
+    # and size) each value was pulled from, keyed by (fluorophore, state, metajob, solvent).
+    # only written back on a clean exit, so enter it before the frames it describes: it then
+    # exits after them and never records values whose frame failed to store
+    def __init__(self, dfName: str) -> None:
+        self.path = f'{r.loadConfig().local.dbLocationMac}/{dfName}.fingerprints'
+        self.fingerprints = {}
+
+    def __enter__(self) -> dict[tuple, tuple]:
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                self.fingerprints = pickle.load(f)
+        return self.fingerprints
+
+    def __exit__(self, a, b, c) -> None:
+        if a != None:
+            return
+        with open(f'{self.path}.tmp', 'wb') as f:
+            pickle.dump(self.fingerprints, f)
+        os.replace(f'{self.path}.tmp', self.path)
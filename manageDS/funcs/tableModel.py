@@ -0,0 +1,70 @@
+import resources as r
+import numpy as np
+import pandas as pd
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor
+from .generalFuncs import isMissing
+
+# colour rules shared by the HTML (Styler) and table (FrameModel) displays. each maps a cell
+# value to a colour name, or '' to leave the cell as is
+statusColours = {r.Status.failed: 'red',
+                 r.Status.finished: 'teal',
+                 r.Status.running: 'orange',
+                 r.Status.queued: 'blue',
+                 r.Status.timed_out: 'purple'}
+
+def statusColour(x) -> str:
+    return 'grey' if x == None else statusColours.get(x, '')
+
+def statusStyles(df: pd.DataFrame) -> pd.DataFrame:
+    # css for a whole status frame in one pass: the cells' categorical codes index straight into a
+    # per-status lookup, with anything that isn't a Status (None) falling through to grey
+    statuses = list(r.Status)
+    lookup = np.array([f'color : {statusColour(i)}' if statusColour(i) != '' else '' for i in statuses] + ['color : grey'])
+    codes = pd.Categorical(df.to_numpy(dtype=object).ravel(), categories=statuses).codes
+    return pd.DataFrame(lookup[codes].reshape(df.shape), index=df.index, columns=df.columns)
+
+def presenceColour(x) -> str:
+    return 'red' if isMissing(x) else 'blue'
+
+def energyColour(x) -> str:
+    return 'blue' if x not in [None, 0.00] else 'red'
+
+def flagColour(x) -> str:
+    return 'blue' if x else 'red'
+
+class FrameModel(QAbstractTableModel):
+    # read-only view of a (MultiIndex) frame. nothing is rendered up front: the view only asks
+    # for the cells it is showing, and their colours are worked out as they are requested
+    def __init__(self, df: pd.DataFrame, colour, precision: int = None) -> None:
+        super().__init__()
+        self.df = df
+        self.colour = colour
+        self.precision = precision
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.df.index)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.df.columns)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.df.iat[index.row(), index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if self.precision != None and isinstance(value, float) and not isMissing(value):
+                return f'{value:.{self.precision}f}'
+            return str(value)
+        if role == Qt.ItemDataRole.ForegroundRole:
+            colour = self.colour(value)
+            return QColor(colour) if colour != '' else None
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return str(self.df.columns[section])
+        key = self.df.index[section]
+        return '  '.join(str(i) for i in key) if isinstance(key, tuple) else str(key)
@@ -0,0 +1,44 @@
+import os
+import hashlib
+import resources as r
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+# molecule drawings cached on disk as PNGs, named for the SMILES, legend and size they were drawn
+# with, so RDKit only ever draws a molecule once
+def thumbnailDir() -> str:
+    return f'{r.loadConfig().local.dbLocationMac}/thumbnails'
+
+def thumbnailPath(smiles: str, legend: str, size: tuple[int, int]) -> str:
+    digest = hashlib.sha256(f'{smiles}|{legend}|{size[0]}x{size[1]}'.encode()).hexdigest()
+    return f'{thumbnailDir()}/{digest}.png'
+
+def renderThumbnail(smiles: str, legend: str, size: tuple[int, int]) -> str:
+    path = thumbnailPath(smiles, legend, size)
+    if not os.path.exists(path):
+        # rdkit is only imported here, the first time a molecule actually has to be drawn
+        from rdkit import Chem
+        from rdkit.Chem import Draw
+        os.makedirs(thumbnailDir(), exist_ok=True)
+        image = Draw.MolToImage(Chem.MolFromSmiles(smiles), size=size, legend=legend)
+        image.save(f'{path}.tmp', format='PNG')
+        os.replace(f'{path}.tmp', path)
+    return path
+
+class ThumbnailSignals(QObject):
+    thumbnail = pyqtSignal(int, int, str)
+    finished = pyqtSignal()
+
+class ThumbnailRunner(QRunnable):
+    # draws (or finds) each molecule off the GUI thread, emitting (section, position, png path)
+    # as each one is ready
+    def __init__(self, sections: list[list[tuple[str, str]]], size: tuple[int, int] = (400, 400)):
+        super().__init__()
+        self.signals = ThumbnailSignals()
+        self.sections = sections
+        self.size = size
+
+    def run(self) -> None:
+        for section, molecules in enumerate(self.sections):
+            for position, (smiles, legend) in enumerate(molecules):
+                self.signals.thumbnail.emit(section, position, renderThumbnail(smiles, legend, self.size))
+        self.signals.finished.emit()
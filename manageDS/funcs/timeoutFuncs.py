@@ -0,0 +1,48 @@
+import time
+import resources as r
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from PyQt6.QtCore import QRunnable, pyqtSlot, pyqtSignal, QObject
+from socket import gaierror
+
+# seconds a cluster's timed out list is reused for before it's scanned again
+scanTTL = 300
+# {cluster: (time scanned, jobs)}
+scanCache = {}
+scanCacheLock = Lock()
+
+def scanCluster(cluster, handler=r.clusterHandler, fresh: bool = False) -> list[str]:
+    with scanCacheLock:
+        cached = scanCache.get(cluster)
+    if not fresh and cached != None and time.monotonic() - cached[0] < scanTTL:
+        return cached[1]
+    with handler(cluster) as clu:
+        jobs = list(clu.timed_out())
+    with scanCacheLock:
+        scanCache[cluster] = (time.monotonic(), jobs)
+    return jobs
+
+class TimedOutSignals(QObject):
+    scanned = pyqtSignal(object, list)
+    socketError = pyqtSignal(object)
+    finished = pyqtSignal()
+
+class TimedOutRunner(QRunnable):
+    # scans every cluster at once, emitting each one's timed out jobs as soon as it answers
+    def __init__(self, clusters: list, fresh: bool = False, handler=None):
+        super().__init__()
+        self.signals = TimedOutSignals()
+        self.clusters = clusters
+        self.fresh = fresh
+        self.handler = r.clusterHandler if handler == None else handler
+
+    @pyqtSlot()
+    def run(self) -> None:
+        with ThreadPoolExecutor(max_workers=max(len(self.clusters), 1)) as pool:
+            futures = {pool.submit(scanCluster, cluster, self.handler, self.fresh): cluster for cluster in self.clusters}
+            for future in as_completed(futures):
+                try:
+                    self.signals.scanned.emit(futures[future], future.result())
+                except gaierror:
+                    self.signals.socketError.emit(futures[future])
+        self.signals.finished.emit()
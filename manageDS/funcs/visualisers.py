@@ -1,68 +1,90 @@
 import resources as r
+from sharedFuncs.storeFuncs import readFrame, frameVersion
 import pandas as pd
 import numpy as np
 import pathlib
-from seaborn import light_palette
-from rdkit import Chem
-from rdkit.Chem import Draw
-from PIL.ImageQt import ImageQt
+from sharedFuncs.importFuncs import lazyModule
 from PyQt6 import uic
 from PyQt6.QtGui import QPixmap, QFont
-from PyQt6.QtWidgets import QDialog, QTextEdit, QLabel
+from PyQt6.QtWidgets import QDialog, QTextEdit, QLabel, QTableView, QFileDialog, QGridLayout
 from copy import deepcopy
-from .generalFuncs import extractIndices
+from .tableModel import FrameModel, statusColour, statusStyles, presenceColour, energyColour, flagColour
+from .queryFuncs import query, exportQuery
+from .thumbnailFuncs import ThumbnailRunner
+from .timeoutFuncs import TimedOutRunner
+from .generalFuncs import isMissing
 from .classes import Ui
 
+seaborn = lazyModule('seaborn')
+
 class visDS(QDialog):
     def __init__(self):
         super().__init__()
         uic.loadUi(f'{pathlib.Path(__file__).parent.resolve()}/../visDS.ui', self)
 
 def visualise_ds(ui: Ui) -> None:
-
     ui.visDS = visDS()
 
+    sections = [('Dataset', [i for i in r.Fluorophores if i.revised]),
+                ('Gas Phase', [i for i in r.Fluorophores if i.gas])]
+    grids = []
+    for title, fluorophores in sections:
+        label = QLabel()
+        label.setText(title)
+        label.setFont(QFont('Arial', 20))
+        ui.visDS.verticalLayout_2.addWidget(label)
+        grids += [QGridLayout()]
+        ui.visDS.verticalLayout_2.addLayout(grids[-1])
 
-    label = QLabel()
-    label.setText('Dataset')
-    label.setFont(QFont('Arial', 20))
-    ui.visDS.verticalLayout_2.addWidget(label)
-    mols = []
-    nameList = []
-    for fluorophore in r.Fluorophores:
-        if fluorophore.revised:
-            nameList += [fluorophore.fluorophore]
-            mols += [Chem.MolFromSmiles(fluorophore.smiles)]
-    pm1 = QPixmap.fromImage(ImageQt(Draw.MolsToGridImage(mols, legends=nameList, subImgSize=(400, 400))))
-    label = QLabel()
-    label.setPixmap(pm1)
-    ui.visDS.verticalLayout_2.addWidget(label)
-
-
-    label = QLabel()
-    label.setText('Gas Phase')
-    label.setFont(QFont('Arial', 20))
-    ui.visDS.verticalLayout_2.addWidget(label)
-    mols = []
-    nameList = []
-    for fluorophore in r.Fluorophores:
-        if fluorophore.gas:
-            nameList += [fluorophore.fluorophore]
-            mols += [Chem.MolFromSmiles(fluorophore.smiles)]
-    pm2 = QPixmap.fromImage(ImageQt(Draw.MolsToGridImage(mols, legends=nameList, subImgSize=(400, 400))))
-    label = QLabel()
-    label.setPixmap(pm2)
-    ui.visDS.verticalLayout_2.addWidget(label)
+    # three to a row, as MolsToGridImage laid them out, filled in as the runner gets to them
+    def place(section: int, position: int, path: str) -> None:
+        label = QLabel()
+        label.setPixmap(QPixmap(path))
+        grids[section].addWidget(label, position // 3, position % 3)
 
+    runner = ThumbnailRunner([[(i.smiles, i.fluorophore) for i in fluorophores] for _, fluorophores in sections])
+    runner.signals.thumbnail.connect(place)
+    ui.visDS.thumbnailSignals = runner.signals
+    ui.threadpool.start(runner)
     ui.visDS.show()
 
 
 def showDF(ui: Ui) -> None:
     prettyDisplay(ui)
 
+# keyed on the frames' on-disk versions, so nothing is read, styled or rendered again until a pull
+# (or an edit) has written the frame. frameCache/styleCache: {dfName: (version, frame/styles)},
+# renderCache: {(heading, title, precision, max rows): (frame shown, html)}
+frameCache = {}
+styleCache = {}
+renderCache = {}
+
+def cachedFrame(dfName: str) -> pd.DataFrame:
+    version = frameVersion(dfName)
+    if dfName not in frameCache or frameCache[dfName][0] != version:
+        frameCache[dfName] = (version, readFrame(dfName))
+    return frameCache[dfName][1]
+
+def cachedStatusStyles(dfName: str, df: pd.DataFrame) -> pd.DataFrame:
+    version = frameVersion(dfName)
+    if dfName not in styleCache or styleCache[dfName][0] != version:
+        styleCache[dfName] = (version, statusStyles(df))
+    return styleCache[dfName][1]
+
 def prettyDisplay(ui: Ui, full: bool = False, uiOutput: QTextEdit = None) -> None:
     output = ui.general_output if uiOutput == None else uiOutput
     output.clear()
+    sections = displaySections(ui, full)
+    if uiOutput == None and ui.general_tableview.isChecked():
+        showTables(ui, sections)
+    else:
+        if uiOutput == None:
+            showOutput(ui)
+        # rendered once and set in one go rather than re-serialising the document per section
+        output.setHtml(''.join(cachedRender(*section) for section in sections))
+
+def displaySections(ui: Ui, full: bool) -> list[tuple]:
+    # (heading html, tab title, frame, colour rule, precision, max rows, precomputed styles) for every ticked frame
     stateList = []
     if ui.general_s0.isChecked():
         stateList += [r.States.s0]
@@ -71,78 +93,87 @@ def prettyDisplay(ui: Ui, full: bool = False, uiOutput: QTextEdit = None) -> Non
     if ui.general_s2.isChecked():
         stateList += [r.States.s2]
 
+    sections = []
     if ui.general_progress.isChecked() and not full:
-        with r.statusLoad('progress') as df:
-            metajobList = [i.data(1) for i in ui.general_metajobs.selectedItems()]
-            if full:
-                _, _, _, metajobList = extractIndices(df)
-            for metajob in metajobList:
-                output.setHtml(output.toHtml() + f'<h2>{metajob}</h2>')
-                states = deepcopy(stateList)
-                if not metajob.gs:
-                    try:
-                        states.remove(r.States.s0)
-                    except ValueError:
-                        pass
-                if not metajob.es:
-                    try:
-                        states.remove(r.States.s1)
-                    except ValueError:
-                        pass
-                    try:
-                        states.remove(r.States.s2)
-                    except ValueError:
-                        pass
-
-                for state in states:
-                    output.setHtml(output.toHtml() + f'<h3>{state}</h3>')
-                    dfOut = df.loc[(slice(None), state, metajob)].style\
-                                                                 .applymap(lambda x: 'color : red' if x == r.Status.failed else '')\
-                                                                 .applymap(lambda x: 'color : teal' if x == r.Status.finished else '')\
-                                                                 .applymap(lambda x: 'color : orange' if x == r.Status.running else '')\
-                                                                 .applymap(lambda x: 'color : blue' if x == r.Status.queued else '')\
-                                                                 .applymap(lambda x: 'color : purple' if x == r.Status.timed_out else '')\
-                                                                 .applymap(lambda x: 'color : grey' if x == None else '').to_html()
-                    output.setHtml(output.toHtml() + dfOut)
+        df = cachedFrame('progress')
+        styles = cachedStatusStyles('progress', df)
+        metajobList = [i.data(1) for i in ui.general_metajobs.selectedItems()]
+        for metajob in metajobList:
+            heading = f'<h2>{metajob}</h2>'
+            states = deepcopy(stateList)
+            if not metajob.gs:
+                try:
+                    states.remove(r.States.s0)
+                except ValueError:
+                    pass
+            if not metajob.es:
+                try:
+                    states.remove(r.States.s1)
+                except ValueError:
+                    pass
+                try:
+                    states.remove(r.States.s2)
+                except ValueError:
+                    pass
+
+            for state in states:
+                sections += [(heading + f'<h3>{state}</h3>', f'{metajob} {state}', df.loc[(slice(None), state, metajob)], statusColour, None, None, styles.loc[(slice(None), state, metajob)])]
+                heading = ''
 
     if ui.general_spectra.isChecked() or full:
-        with r.statusLoad('spectra') as df:
-            dfOut = df.notnull().style.applymap(lambda x: 'color : blue' if x else 'color : red').to_html()
-            output.setHtml(output.toHtml() + dfOut)
+        sections += [('', 'Spectra', cachedFrame('spectra').notnull(), flagColour, None, None, None)]
 
     if ui.general_energy.isChecked() or full:
-        with r.statusLoad('dataset') as df:
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x not in [None, 0.00] else 'color : red').format(precision=3).to_html()
-            output.setHtml(output.toHtml() + dfOut)
+        sections += [('', 'Energy', cachedFrame('dataset'), energyColour, 3, None, None)]
 
-    if ui.general_freq.isChecked() or full:
-        with r.statusLoad('comp-freq') as df:
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
-            output.setHtml(output.toHtml() + dfOut)
+    for dfName, title, checked in [('comp-freq', 'Frequencies', ui.general_freq.isChecked()),
+                                   ('comp-ex', 'Excitation', ui.general_excitation.isChecked()),
+                                   ('comp-em', 'Emission', ui.general_emission.isChecked()),
+                                   ('comp-casscf', 'CAS', ui.general_cas.isChecked()),
+                                   ('comp-pol', 'Polarisabilities', ui.general_pol.isChecked())]:
+        if checked or full:
+            sections += [('', title, cachedFrame(dfName), presenceColour, 3, 100, None)]
+    return sections
 
-    if ui.general_excitation.isChecked() or full:
-        with r.statusLoad('comp-ex') as df:
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
-            output.setHtml(output.toHtml() + dfOut)
+def renderSection(heading: str, title: str, df: pd.DataFrame, colour, precision: int, maxRows: int, styles: pd.DataFrame) -> str:
+    if styles is not None:
+        style = df.style.apply(lambda _: styles, axis=None)
+    else:
+        style = df.style.applymap(lambda x: f'color : {colour(x)}' if colour(x) != '' else '')
+    if precision != None:
+        style = style.format(precision=precision)
+    return heading + style.to_html(max_rows=maxRows)
 
-    if ui.general_emission.isChecked() or full:
-        with r.statusLoad('comp-em') as df:
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
-            output.setHtml(output.toHtml() + dfOut)
+def cachedRender(heading: str, title: str, df: pd.DataFrame, colour, precision: int, maxRows: int, styles: pd.DataFrame) -> str:
+    # a section is only rendered again if what it shows changed, so after a pull the metajob/state
+    # slices the runner didn't touch are reused even though the frame itself was rewritten
+    key = (heading, title, precision, maxRows)
+    if key in renderCache and (renderCache[key][0] is df or renderCache[key][0].equals(df)):
+        return renderCache[key][1]
+    html = renderSection(heading, title, df, colour, precision, maxRows, styles)
+    renderCache[key] = (df, html)
+    return html
 
-    if ui.general_cas.isChecked() or full:
-        with r.statusLoad('comp-casscf') as df:
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
-            output.setHtml(output.toHtml() + dfOut)
-            print('done')
+def showTables(ui: Ui, sections: list[tuple]) -> None:
+    while ui.general_tables.count() > 0:
+        widget = ui.general_tables.widget(0)
+        ui.general_tables.removeTab(0)
+        widget.deleteLater()
+    for heading, title, df, colour, precision, maxRows, styles in sections:
+        view = QTableView()
+        view.setModel(FrameModel(df, colour, precision))
+        ui.general_tables.addTab(view, title)
+    ui.general_output.hide()
+    ui.general_tables.show()
 
-    if ui.general_pol.isChecked() or full:
-        with r.statusLoad('comp-pol') as df:
-            dfOut = df.style.applymap(lambda x: 'color : blue' if x != None else 'color : red').format(precision=3).to_html(max_rows=100)
-            output.setHtml(output.toHtml() + dfOut)
 
+def showOutput(ui: Ui) -> None:
+    # back to the text output if the table view had replaced it
+    ui.general_tables.hide()
+    ui.general_output.show()
 
 def timedOut(ui: Ui) -> None:
+    showOutput(ui)
     ui.general_output.clear()
     clusters = []
     if ui.general_m3.isChecked():
@@ -152,13 +183,18 @@ def timedOut(ui: Ui) -> None:
     if ui.general_gadi.isChecked():
         clusters += [r.clusters.gadi]
 
-    for cluster in clusters:
-        ui.general_output.setPlainText(ui.general_output.toPlainText() + f'{cluster}:\n')
-        with r.clusterHandler(cluster) as clu:
-            jobs = clu.timed_out()
-        for job in jobs:
-            ui.general_output.setPlainText(ui.general_output.toPlainText() + job + '\n')
-        ui.general_output.setPlainText(ui.general_output.toPlainText() + '\n')
+    # scanned off the GUI thread, every cluster at once; a full check skips the cached lists
+    def scanned(cluster, jobs: list[str]) -> None:
+        ui.general_output.append('\n'.join([f'{cluster}:'] + jobs + ['']))
+
+    def unreachable(cluster) -> None:
+        ui.general_output.append(f'{cluster}:\nCould not connect to cluster!\n')
+
+    runner = TimedOutRunner(clusters, fresh=ui.general_full.isChecked())
+    runner.signals.scanned.connect(scanned)
+    runner.signals.socketError.connect(unreachable)
+    ui.timedOutSignals = runner.signals
+    ui.threadpool.start(runner)
 
 def viewSolvents(ui: Ui) -> None:
     fluorophores, solvents, methods = r.fluorophores_solvents_methods()
@@ -177,9 +213,10 @@ def viewSolvents(ui: Ui) -> None:
                                         ((solvent.n**2) - 1) / (solvent.e - 1),
                                         (solvent.e - (solvent.n**2)) / (solvent.e - 1)]
 
-    cmap = light_palette('#a275ac', as_cmap=True)
+    cmap = seaborn.light_palette('#a275ac', as_cmap=True)
     df = pd.DataFrame.from_dict(solventDict, orient='index', columns=headers)
     dfOut = df.style.background_gradient(cmap=cmap).format(precision=2).to_html()
+    showOutput(ui)
     ui.general_output.setPlainText('')
     ui.general_output.setHtml(dfOut)
 
@@ -192,42 +229,33 @@ def printDBSelection(ui: Ui, dfName: str) -> None:
                 'comp-casscf': [ui.select_cas_states, ui.select_cas_metajobs, ui.select_cas_properties],
                 'comp-pol': [ui.select_pol_states, ui.select_pol_metajobs, ui.select_pol_properties],
                 }
-    cmap = light_palette('#a275ac', as_cmap=True)
-
-    with r.statusLoad(df=dfName) as df:
-        for prop in [i.data(1) for i in widgDict[dfName][2].selectedItems()]:
-            precision = 0 if 'neg' in prop.name else 6 if 'de' in prop.name else 6 if 'zpve' in prop.name else 3
-            astype = object if 't_' in prop.name else float
-            astype2 = float if (('t_' in prop.name) and (ui.select_pol_vecs.isChecked())) else object if (('t_' in prop.name) and (not ui.select_pol_vecs.isChecked())) else float
-            astype = object if dfName == 'comp-pol' and prop != r.Energy.Polarisability.iso else float
-            if dfName == 'comp-pol':
-                astype2 = astype
-                filteredSolvents = [r.Solvents.gas]
-            else:
-                filteredSolvents = [i.data(1) for i in ui.select_solvents.selectedItems()]
-
-            def isNaNFunc(x) -> bool:
-                if type(x) not in [float, int]:
-                    if x == None:
-                        return True
-                    else:
-                        return False
-                else:
-                    if pd.isna(x):
-                        return True
-                    else:
-                        return False
-
-            dfOut = df.loc[([i.data(1) for i in ui.select_fluorophores.selectedItems()],
-                           [i.data(1) for i in widgDict[dfName][0].selectedItems()],
-                           [i.data(1) for i in widgDict[dfName][1].selectedItems()],
-                           prop),
-                           filteredSolvents]\
-                      .astype(astype)\
-                      .applymap(lambda x: np.linalg.norm(np.array(x)) if type(x) == tuple and ui.select_pol_vecs.isChecked() else x)\
-                      .astype(astype2)\
-                      .style.background_gradient(cmap=cmap, axis=1)\
-                      .applymap(lambda x: 'color: red' if isNaNFunc(x) else '')\
-                      .applymap(lambda x: 'background-color: transparent' if isNaNFunc(x) else '')\
-                      .format(precision=precision).to_html()
-            ui.select_output.setHtml(ui.select_output.toHtml() + dfOut)
+    cmap = seaborn.light_palette('#a275ac', as_cmap=True)
+
+    properties = [i.data(1) for i in widgDict[dfName][2].selectedItems()]
+    solvents = [r.Solvents.gas] if dfName == 'comp-pol' else [i.data(1) for i in ui.select_solvents.selectedItems()]
+    norms = ui.select_pol_vecs.isChecked() or dfName != 'comp-pol'
+    result = query(dfName,
+                   [i.data(1) for i in ui.select_fluorophores.selectedItems()],
+                   [i.data(1) for i in widgDict[dfName][0].selectedItems()],
+                   [i.data(1) for i in widgDict[dfName][1].selectedItems()],
+                   properties, solvents, norms=norms)
+    ui.select_result = result
+
+    html = []
+    for prop in properties:
+        precision = 0 if 'neg' in prop.name else 6 if 'de' in prop.name else 6 if 'zpve' in prop.name else 3
+        dfOut = result[result.index.get_level_values(3) == prop]
+        missing = dfOut.isna().to_numpy() if norms else np.vectorize(isMissing, otypes=[bool])(dfOut.to_numpy(dtype=object))
+        style = dfOut.style
+        if norms:
+            style = style.background_gradient(cmap=cmap, axis=1)
+        html += [style.apply(lambda _: np.where(missing, 'color: red; background-color: transparent', ''), axis=None)
+                      .format(precision=precision).to_html()]
+    ui.select_output.setHtml(''.join(html))
+
+def exportSelection(ui: Ui) -> None:
+    if getattr(ui, 'select_result', None) is None:
+        return
+    path, _ = QFileDialog.getSaveFileName(ui, 'Export Selection', '', 'CSV (*.csv);;Parquet (*.parquet)')
+    if path != '':
+        exportQuery(ui.select_result, path)
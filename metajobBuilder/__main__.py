@@ -1,29 +1,30 @@
 import sys
 import pathlib
 import resources as r
-from pandas import DataFrame
+from sharedFuncs.storeFuncs import statusLoad, readFrame, indexSummary, refreshMeta
 from functools import partial
-from PyQt6.QtCore import QRunnable, pyqtSlot, pyqtSignal, QObject, QThreadPool
+from PyQt6.QtCore import Qt, QRunnable, pyqtSlot, pyqtSignal, QObject, QThreadPool
+from PyQt6.QtGui import QStandardItem
 from PyQt6 import uic
-from PyQt6.QtWidgets import QMainWindow, QListWidget, QListWidgetItem, QComboBox, QApplication
+from PyQt6.QtWidgets import QMainWindow, QListWidget, QComboBox, QApplication
+from sharedFuncs.clusterFuncs import ThreadHandlers
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .planFuncs import JobPlan, pick
+from sharedFuncs.bundleFuncs import packJobs, bundleName, recordBundle
+from sharedFuncs.resourceFuncs import ResourceModel, readHistory, features
 import qtawesome as qta
 
+# upper bound on simultaneous buildJob calls (input upload and submission) against the cluster
+maxUploads = 4
+# most jobs packed into a single scheduler submission when bundling
+bundleSize = 16
+
 class Ui(QMainWindow):
     def __init__(self):
         super(Ui, self).__init__()
         uic.loadUi(f'{pathlib.Path(__file__).parent.resolve()}/metajobBuilder.ui', self)
         self.show()
 
-def extractIndices(df: DataFrame) -> list[float]:
-    levels = len(df.index[0])
-    indexLists = [[] for i in range(levels)]
-    for row in df.index:
-        for count, level in enumerate(row):
-            if level not in indexLists[count]:
-                indexLists[count] += [level]
-    return [df.columns.to_list()] + indexLists
-
-
 class WorkerSignals(QObject):
     setup = pyqtSignal(int)
     output = pyqtSignal(str)
@@ -39,6 +40,7 @@ class Runner(QRunnable):
         super().__init__()
         self.ui = ui_in
         self.shutdownCheck = False
+        self.model = None
 
     @pyqtSlot()
     def run(self) -> None:
@@ -62,111 +64,229 @@ class Runner(QRunnable):
 
         cluster = r.loadRemotes(unloaded_cluster)
 
-        with r.clusterHandler(unloaded_cluster) as clu:
-            with r.statusLoad(df='progress') as df:
-                _, _, states, _ = extractIndices(df)
-                metajob = self.ui.jobType_widg.currentData()
-                states = [i.data(1) for i in self.ui.stateList_widg.selectedItems()]
-                if not metajob.gs:
-                    try:
-                        states.remove(r.States.s0)
-                        self.signals.output.emit(f'{r.States.s0} not logical with {metajob}')
-                    except ValueError:
-                        pass
-                if not metajob.es:
-                    try:
-                        states.remove(r.States.s1)
-                        self.signals.output.emit(f'{r.States.s1} not logical with {metajob}')
-                    except ValueError:
-                        pass
-                    try:
-                        states.remove(r.States.s2)
-                        self.signals.output.emit(f'{r.States.s2} not logical with {metajob}')
-                    except ValueError:
-                        pass
-                progressSteps = len(states)*len([i.data(1) for i in self.ui.fluorophoreList_widg.selectedItems()])*len([i.data(1) for i in self.ui.solventList_widg.selectedItems()])                
-                self.signals.setup.emit(progressSteps)
-                for state in states:
-                    for fluorophore in [i.data(1) for i in self.ui.fluorophoreList_widg.selectedItems()]:
-                        for solvent in [i.data(1) for i in self.ui.solventList_widg.selectedItems()]:
-                            if self.shutdownCheck:
-                                self.signals.shutdown.emit()
-                                return
-                            if (fluorophore.gas) and (not fluorophore.revised) and (solvent != r.Solvents.gas):
-                                pass
-                            else:
-                                if (solvent != r.Solvents.gas) and (metajob.gasonly):
-                                    self.signals.output.emit(f'Metajob {metajob} cannot be used with solvent')
-                                else:
-                                    refSolvent = solvent if self.ui.refJobSolvent_widg.currentData() == 'Same as Main Job' else self.ui.refJobSolvent_widg.currentData()
-                                    refState = state if self.ui.refJobState_widg.currentData() == 'Same as Main Job' else self.ui.refJobState_widg.currentData()
-                                    status = df.at[(fluorophore, state, metajob), solvent]
-                                    refStatus = df.at[(fluorophore, refState, self.ui.refJobType_widg.currentData()), refSolvent]
-                                    if refStatus == r.Status.finished or self.ui.force_widg.isChecked():
-                                        if status != r.Status.finished or self.ui.resubmit_widg.isChecked():
-                                            if metajob.job == r.Jobs.esd:
-                                                refState = r.States.s0
-                                            refJob = r.Job.from_MetaJob(self.ui.refJobType_widg.currentData(), fluorophore, refSolvent, refState, cluster=cluster)
-                                            if self.ui.orca_freqIn_widg.isChecked():
-                                                freqJob = r.MetaJobs.or_wb_freq
-                                                jobRefJob = r.Job.from_MetaJob(freqJob, fluorophore, refSolvent, refState, cluster=cluster)
-                                            else:
-                                                jobRefJob = refJob
-                                            if (metajob.job == r.Jobs.esd and state == r.States.s0):
-                                                esdState = self.ui.orca_esd_es_widg.currentData()
-                                            else:
-                                                esdState = r.States.s0
-
-                                            job = r.Job.from_MetaJob(metajob, fluorophore, solvent, state, catxyzpath=refJob.xyzfile, submit=self.ui.submit_widg.isChecked(),
-                                                                     partner=self.ui.partner_widg.isChecked(), procs=self.ui.cores_widg.value(),
-                                                                     mem=self.ui.memory_widg.value(), time=(self.ui.time_widg.value()*24), cluster=cluster,
-                                                                     # ORCA Specific
-                                                                     kdiis=self.ui.orca_kdiis_widg.isChecked(), soscf=self.ui.orca_soscf_widg.isChecked(), restart=self.ui.restart_widg.isChecked(),
-                                                                     notrah=self.ui.orca_notrah_widg.isChecked(), scfstring=self.ui.orca_scfstring_widg.text(), refJob=jobRefJob,
-                                                                     verytightopt=self.ui.orca_vtightopt_widg.isChecked(), orbstep=self.ui.orca_orbstep_widg.currentText(),
-                                                                     switchstep=self.ui.orca_switchstep_widg.currentText(), switchconv=self.ui.orca_switchconv_widg.value(), inhess=self.ui.orca_freqIn_widg.isChecked(),
-                                                                     calchess=self.ui.orca_calchess_widg.isChecked(), recalchess=self.ui.orca_recalchess_widg.value(), esdState=esdState)
-                                            if metajob.job in [r.Jobs.esd]:
-                                                if state == r.States.s0:
-                                                    job.esdLowerJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, r.States.s0, cluster=cluster)
-                                                    job.esdHigherJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, self.ui.orca_esd_es_widg.currentData(), cluster=cluster)
-                                                else:
-                                                    job.esdLowerJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, r.States.s0, cluster=cluster)
-                                                    job.esdHigherJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, state, cluster=cluster)
-
-                                            if self.ui.orca_mo_widg.isChecked():
-                                                orca_mo_refSolvent = solvent if self.ui.orca_mo_refJobSolvent_widg.currentData() == 'Same as Main Job' else self.ui.orca_mo_refJobSolvent_widg.currentData()
-                                                orca_mo_refState = state if self.ui.orca_mo_refJobState_widg.currentData() == 'Same as Main Job' else self.ui.orca_mo_refJobState_widg.currentData()
-                                                mo_ref_job = r.Job.from_MetaJob(self.ui.orca_mo_refJobType_widg.currentData(), fluorophore, orca_mo_refSolvent, orca_mo_refState, cluster=cluster)
-                                                job.mopath = f'{mo_ref_job.path}/{mo_ref_job.name}/{mo_ref_job.name}.gbw'
-
-                                            if job.method.rank == r.Methods.Rank.cas and state == r.States.s0:
-                                                job.perturbedRoots == job.nroots
-                                            output = clu.buildJob(job)
-                                            if type(output) == list:
-                                                self.signals.output.emit('\n'.join(output))
-                                            elif type(output) == str:
-                                                self.signals.output.emit(output)
-
-
-                                            if self.ui.submit_widg.isChecked() or self.ui.resubmit_widg.isChecked():
-                                                df.at[(fluorophore, state, metajob), solvent] = r.Status.queued
-                                        else:
-                                            self.signals.output.emit(f'{metajob} of state {state} of {fluorophore} in {solvent} already finished')
-                                    else:
-                                        self.signals.output.emit(f'Reference job: {self.ui.refJobType_widg.currentData()} of state {refState} of {fluorophore} in {refSolvent} not finished')
-                            self.signals.step.emit()
+        metajob = self.ui.jobType_widg.currentData()
+        states = [i.data(1) for i in self.ui.stateList_widg.selectedItems()]
+        if not metajob.gs:
+            try:
+                states.remove(r.States.s0)
+                self.signals.output.emit(f'{r.States.s0} not logical with {metajob}')
+            except ValueError:
+                pass
+        if not metajob.es:
+            try:
+                states.remove(r.States.s1)
+                self.signals.output.emit(f'{r.States.s1} not logical with {metajob}')
+            except ValueError:
+                pass
+            try:
+                states.remove(r.States.s2)
+                self.signals.output.emit(f'{r.States.s2} not logical with {metajob}')
+            except ValueError:
+                pass
+        fluorophores = [i.data(1) for i in self.ui.fluorophoreList_widg.selectedItems()]
+        solvents = [i.data(1) for i in self.ui.solventList_widg.selectedItems()]
+        progressSteps = len(states)*len(fluorophores)*len(solvents)
+        self.signals.setup.emit(progressSteps)
+
+        # the plan (and a dry run) only reads the frame, progress is loaded for writing once jobs are submitted
+        plan = JobPlan(readFrame('progress'), metajob, states, fluorophores, solvents, self.plan_options())
+        for line in plan.summary():
+            self.signals.output.emit(line)
+        if self.ui.plan_widg.isChecked():
+            return
+
+        # per-job allocations from the recorded history, in place of the form's values
+        self.model = ResourceModel(readHistory()) if self.ui.estimate_widg.isChecked() else None
+        jobs = self.build_jobs(plan, cluster)
+        if self.shutdownCheck:
+            return
+        with statusLoad(df='progress') as df:
+            self.submit_jobs(df, metajob, jobs, unloaded_cluster)
+
+    def plan_options(self) -> dict:
+        return {'refMetajob': self.ui.refJobType_widg.currentData(),
+                'refState': self.ui.refJobState_widg.currentData(),
+                'refSolvent': self.ui.refJobSolvent_widg.currentData(),
+                'freqIn': self.ui.orca_freqIn_widg.isChecked(),
+                'esdMetajob': self.ui.orca_esd_job_widg.currentData(),
+                'esdState': self.ui.orca_esd_es_widg.currentData(),
+                'mo': self.ui.orca_mo_widg.isChecked(),
+                'moMetajob': self.ui.orca_mo_refJobType_widg.currentData(),
+                'moState': self.ui.orca_mo_refJobState_widg.currentData(),
+                'moSolvent': self.ui.orca_mo_refJobSolvent_widg.currentData(),
+                'force': self.ui.force_widg.isChecked(),
+                'resubmit': self.ui.resubmit_widg.isChecked()}
+
+    def build_jobs(self, plan: JobPlan, cluster) -> list[tuple]:
+        # r.Job objects for the plan's ready frontier, made up front without touching the cluster,
+        # as ((fluorophore, state, solvent), job). everything else steps the progress here
+        jobs = []
+        for (fluorophore, state, metajob, solvent), kind, detail in plan.outcomes:
+            if self.shutdownCheck:
+                return jobs
+            if kind == 'ready':
+                refSolvent = pick(self.ui.refJobSolvent_widg.currentData(), solvent)
+                refState = pick(self.ui.refJobState_widg.currentData(), state)
+                jobs += [((fluorophore, state, solvent), self.make_job(metajob, fluorophore, state, solvent, refSolvent, refState, cluster))]
+                continue
+            if kind == 'skipped' and detail != None:
+                self.signals.output.emit(detail)
+            elif kind == 'done':
+                self.signals.output.emit(f'{metajob} of state {state} of {fluorophore} in {solvent} already finished')
+            elif kind == 'blocked':
+                for refFluorophore, refState, refMetajob, refSolvent in detail:
+                    self.signals.output.emit(f'Reference job: {refMetajob} of state {refState} of {refFluorophore} in {refSolvent} not finished')
+            self.signals.step.emit()
+        return jobs
+
+    def make_job(self, metajob, fluorophore, state, solvent, refSolvent, refState, cluster):
+        if metajob.job == r.Jobs.esd:
+            refState = r.States.s0
+        refJob = r.Job.from_MetaJob(self.ui.refJobType_widg.currentData(), fluorophore, refSolvent, refState, cluster=cluster)
+        if self.ui.orca_freqIn_widg.isChecked():
+            freqJob = r.MetaJobs.or_wb_freq
+            jobRefJob = r.Job.from_MetaJob(freqJob, fluorophore, refSolvent, refState, cluster=cluster)
+        else:
+            jobRefJob = refJob
+        if (metajob.job == r.Jobs.esd and state == r.States.s0):
+            esdState = self.ui.orca_esd_es_widg.currentData()
+        else:
+            esdState = r.States.s0
+
+        job = r.Job.from_MetaJob(metajob, fluorophore, solvent, state, catxyzpath=refJob.xyzfile, submit=self.ui.submit_widg.isChecked(),
+                                 partner=self.ui.partner_widg.isChecked(), procs=self.ui.cores_widg.value(),
+                                 mem=self.ui.memory_widg.value(), time=(self.ui.time_widg.value()*24), cluster=cluster,
+                                 # ORCA Specific
+                                 kdiis=self.ui.orca_kdiis_widg.isChecked(), soscf=self.ui.orca_soscf_widg.isChecked(), restart=self.ui.restart_widg.isChecked(),
+                                 notrah=self.ui.orca_notrah_widg.isChecked(), scfstring=self.ui.orca_scfstring_widg.text(), refJob=jobRefJob,
+                                 verytightopt=self.ui.orca_vtightopt_widg.isChecked(), orbstep=self.ui.orca_orbstep_widg.currentText(),
+                                 switchstep=self.ui.orca_switchstep_widg.currentText(), switchconv=self.ui.orca_switchconv_widg.value(), inhess=self.ui.orca_freqIn_widg.isChecked(),
+                                 calchess=self.ui.orca_calchess_widg.isChecked(), recalchess=self.ui.orca_recalchess_widg.value(), esdState=esdState)
+        if metajob.job in [r.Jobs.esd]:
+            if state == r.States.s0:
+                job.esdLowerJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, r.States.s0, cluster=cluster)
+                job.esdHigherJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, self.ui.orca_esd_es_widg.currentData(), cluster=cluster)
+            else:
+                job.esdLowerJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, r.States.s0, cluster=cluster)
+                job.esdHigherJob = r.Job.from_MetaJob(self.ui.orca_esd_job_widg.currentData(), fluorophore, solvent, state, cluster=cluster)
+
+        if self.ui.orca_mo_widg.isChecked():
+            orca_mo_refSolvent = solvent if self.ui.orca_mo_refJobSolvent_widg.currentData() == 'Same as Main Job' else self.ui.orca_mo_refJobSolvent_widg.currentData()
+            orca_mo_refState = state if self.ui.orca_mo_refJobState_widg.currentData() == 'Same as Main Job' else self.ui.orca_mo_refJobState_widg.currentData()
+            mo_ref_job = r.Job.from_MetaJob(self.ui.orca_mo_refJobType_widg.currentData(), fluorophore, orca_mo_refSolvent, orca_mo_refState, cluster=cluster)
+            job.mopath = f'{mo_ref_job.path}/{mo_ref_job.name}/{mo_ref_job.name}.gbw'
+
+        if job.method.rank == r.Methods.Rank.cas and state == r.States.s0:
+            job.perturbedRoots == job.nroots
+
+        if self.model != None:
+            estimate = self.model.estimate(**features(job, fluorophore, metajob, solvent))
+            if estimate != None:
+                job.procs, job.mem, job.time = estimate['procs'], estimate['mem'], estimate['hours']
+                self.signals.output.emit(f'{metajob} of state {state} of {fluorophore} in {solvent}: {job.procs} cores, {job.mem} GB, {job.time} h')
+        return job
+
+    def submit_jobs(self, df, metajob, jobs: list[tuple], unloaded_cluster) -> None:
+        # builds (and submits) up to maxUploads jobs at once, each worker on its own connection.
+        # cancelling stops anything not yet started, but jobs already in flight are still recorded.
+        # a build that raises is reported and left out without losing the jobs that went through.
+        # with bundling, jobs sharing an allocation are built without submitting and each pack is
+        # handed to the scheduler as one submission once all of its builds are done, without the
+        # members that failed. nothing is submitted after a cancel
+        submitting = self.ui.submit_widg.isChecked() or self.ui.resubmit_widg.isChecked()
+        with ThreadHandlers(r.clusterHandler, unloaded_cluster) as handlers:
+            bundling = self.ui.bundle_widg.isChecked() and submitting and len(jobs) > 1
+            if bundling and not handlers.get().canBundle():
+                self.signals.output.emit(f'{unloaded_cluster} cannot submit bundles, submitting jobs individually')
+                bundling = False
+            packs = packJobs(jobs, bundleSize) if bundling else [[i] for i in jobs]
+            packOf = {}
+            for count, pack in enumerate(packs):
+                for key, job in pack:
+                    packOf[key] = count
+                    if len(pack) > 1:
+                        job.submit = False
+            built = [[] for _ in packs]
+            remaining = [len(pack) for pack in packs]
+            recorded = set()
+
+            def record(future) -> None:
+                recorded.add(future)
+                key, job = futures[future]
+                pack = packOf[key]
+                remaining[pack] -= 1
+                try:
+                    output = future.result()
+                except Exception as e:
+                    self.signals.output.emit(f'Building {job.name} failed: {e}')
+                    output = None
+                else:
+                    if len(packs[pack]) == 1:
+                        if submitting:
+                            self.mark_queued(df, metajob, [key])
+                    else:
+                        built[pack] += [(key, job)]
+                if type(output) == list:
+                    self.signals.output.emit('\n'.join(output))
+                elif type(output) == str:
+                    self.signals.output.emit(output)
+
+                if remaining[pack] == 0 and len(built[pack]) > 0 and not self.shutdownCheck:
+                    self.submit_bundle(handlers.get(), df, metajob, built[pack])
+                    built[pack] = []
+                self.signals.step.emit()
+
+            with ThreadPoolExecutor(max_workers=maxUploads) as pool:
+                futures = {pool.submit(lambda job: handlers.get().buildJob(job), job): (key, job) for key, job in jobs}
+                for future in as_completed(futures):
+                    if self.shutdownCheck:
+                        pool.shutdown(cancel_futures=True)
+                        break
+                    record(future)
+            # the pool has waited for whatever was in flight when the cancel came
+            for future in futures:
+                if future not in recorded and not future.cancelled():
+                    record(future)
+
+            for members in built:
+                if len(members) > 0:
+                    self.signals.output.emit(f'Cancelled before submission: {", ".join(job.name for _, job in members)}')
+
+    def submit_bundle(self, clu, df, metajob, members: list[tuple]) -> None:
+        # only marked once the scheduler has taken the bundle; submitBundle raises otherwise
+        name = bundleName([job.name for _, job in members])
+        try:
+            output = clu.submitBundle(name, [job for _, job in members])
+        except Exception as e:
+            self.signals.output.emit(f'Submitting {name} failed, its jobs are built but not queued: {e}')
+            return
+        if type(output) == list:
+            self.signals.output.emit('\n'.join(output))
+        elif type(output) == str:
+            self.signals.output.emit(output)
+        recordBundle(clu.cluster_choice, name, [job.name for _, job in members])
+        self.mark_queued(df, metajob, [key for key, _ in members])
+        self.signals.output.emit(f'Submitted {len(members)} jobs as {name}')
+
+    def mark_queued(self, df, metajob, keys: list[tuple]) -> None:
+        for fluorophore, state, solvent in keys:
+            df.at[(fluorophore, state, metajob), solvent] = r.Status.queued
 
 def add_items_list(widget: QListWidget, items: list[object]) -> None:
-    for i in items:
-        item_to_add = QListWidgetItem()
-        item_to_add.setText(str(i))
-        item_to_add.setData(1, i)
-        widget.addItem(item_to_add)
+    # one insert for all the rows, then the data behind each
+    start = widget.count()
+    widget.addItems([str(i) for i in items])
+    for row, i in enumerate(items, start=start):
+        widget.item(row).setData(1, i)
 
 def add_items_combo(widget: QComboBox, items: list[object]) -> None:
+    # appended to the combo's model in one go rather than an addItem per entry
+    rows = []
     for i in items:
-        widget.addItem(str(i), userData=i)
+        item = QStandardItem(str(i))
+        item.setData(i, Qt.ItemDataRole.UserRole)
+        rows += [item]
+    widget.model().invisibleRootItem().appendRows(rows)
 
 def shutdown(ui: Ui) -> None:
     ui.statusBar().showMessage("Cancelled")
@@ -218,8 +338,10 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     ui = Ui()
     app.setWindowIcon(qta.icon('fa5s.tasks'))
-    with r.statusLoad(df='progress') as df:
-        solvents, fluorophores, states, metajobs = extractIndices(df)
+    # the progress frame itself is only loaded once Build is pressed; the lists come from the
+    # index sidecar, which is only rebuilt from the frame if it has gone stale
+    summary = indexSummary(['progress'])
+    solvents, fluorophores, states, metajobs = summary['progress'] if 'progress' in summary else refreshMeta(['progress'])['progress']
 
     # Populate options
     add_items_list(ui.fluorophoreList_widg, fluorophores)
@@ -0,0 +1,73 @@
+import resources as r
+from collections import Counter
+
+sameAsMain = 'Same as Main Job'
+
+def pick(choice, main):
+    return main if choice == sameAsMain else choice
+
+def jobStatus(df, key: tuple):
+    fluorophore, state, metajob, solvent = key
+    try:
+        return df.at[(fluorophore, state, metajob), solvent]
+    except KeyError:
+        return None
+
+def references(metajob, fluorophore, state, solvent, options: dict) -> list[tuple]:
+    # every job a (fluorophore, state, metajob, solvent) job reads from: the reference geometry,
+    # the or_wb_freq hessian, the esd lower/higher pair and the mopath orbitals
+    refSolvent = pick(options['refSolvent'], solvent)
+    refState = pick(options['refState'], state)
+    refs = [(fluorophore, refState, options['refMetajob'], refSolvent)]
+    if options['freqIn']:
+        refs += [(fluorophore, r.States.s0 if metajob.job == r.Jobs.esd else refState, r.MetaJobs.or_wb_freq, refSolvent)]
+    if metajob.job == r.Jobs.esd:
+        refs += [(fluorophore, r.States.s0, options['esdMetajob'], solvent),
+                 (fluorophore, options['esdState'] if state == r.States.s0 else state, options['esdMetajob'], solvent)]
+    if options['mo']:
+        refs += [(fluorophore, pick(options['moState'], state), options['moMetajob'], pick(options['moSolvent'], solvent))]
+    return list(dict.fromkeys(refs))
+
+class JobPlan:
+    # the requested jobs and their references as a graph, built from the progress frame alone.
+    # outcomes holds (key, kind, detail) in request order, kind being one of skipped (detail is
+    # the message, or None), done, blocked (detail is the unfinished references) or ready
+    def __init__(self, df, metajob, states: list, fluorophores: list, solvents: list, options: dict) -> None:
+        self.refs = {}
+        self.status = {}
+        self.outcomes = []
+        for state in states:
+            for fluorophore in fluorophores:
+                for solvent in solvents:
+                    key = (fluorophore, state, metajob, solvent)
+                    if (fluorophore.gas) and (not fluorophore.revised) and (solvent != r.Solvents.gas):
+                        self.outcomes += [(key, 'skipped', None)]
+                        continue
+                    if (solvent != r.Solvents.gas) and (metajob.gasonly):
+                        self.outcomes += [(key, 'skipped', f'Metajob {metajob} cannot be used with solvent')]
+                        continue
+                    self.refs[key] = references(metajob, fluorophore, state, solvent, options)
+                    for node in [key] + self.refs[key]:
+                        if node not in self.status:
+                            self.status[node] = jobStatus(df, node)
+                    if self.status[key] == r.Status.finished and not options['resubmit']:
+                        self.outcomes += [(key, 'done', None)]
+                        continue
+                    waiting = [ref for ref in self.refs[key] if self.status[ref] != r.Status.finished]
+                    if len(waiting) > 0 and not options['force']:
+                        self.outcomes += [(key, 'blocked', waiting)]
+                    else:
+                        self.outcomes += [(key, 'ready', None)]
+
+    def keys(self, kind: str) -> list[tuple]:
+        return [key for key, outcomeKind, _ in self.outcomes if outcomeKind == kind]
+
+    def summary(self) -> list[str]:
+        ready = self.keys('ready')
+        lines = [f'Plan: {len(ready)} ready, {len(self.keys("blocked"))} blocked, {len(self.keys("done"))} done, {len(self.keys("skipped"))} skipped']
+        blockers = Counter(ref for _, kind, waiting in self.outcomes if kind == 'blocked' for ref in waiting)
+        for (fluorophore, state, metajob, solvent), count in blockers.most_common():
+            status = self.status[(fluorophore, state, metajob, solvent)]
+            pending = ' (ready in this plan)' if (fluorophore, state, metajob, solvent) in ready else f' ({status})' if isinstance(status, r.Status) else ' (not run)'
+            lines += [f'  {count} blocked on {metajob} of state {state} of {fluorophore} in {solvent}{pending}']
+        return lines
@@ -0,0 +1,112 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+import resources as r
+from functools import lru_cache
+
+# content-addressed store for the objects held in the spectra frame. each object is pickled
+# (protocol 5) with its array payloads kept out-of-band as raw '.buf' files next to the pickle,
+# which are memory-mapped back in on load. the frame itself only holds SpectrumRefs
+
+def blobDir() -> str:
+    path = f'{r.loadConfig().local.dbLocationMac}/blobs'
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def putBlob(obj) -> str:
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    digest = hashlib.sha256(data)
+    for raw in raws:
+        digest.update(raw)
+    digest = digest.hexdigest()
+
+    path = f'{blobDir()}/{digest}'
+    if not os.path.exists(f'{path}.pkl'):
+        for count, raw in enumerate(raws):
+            with open(f'{path}.{count}.buf', 'wb') as f:
+                f.write(raw)
+        # the pickle goes last, so its presence means the blob is complete
+        with open(f'{path}.pkl.tmp', 'wb') as f:
+            pickle.dump((len(raws), data), f)
+        os.replace(f'{path}.pkl.tmp', f'{path}.pkl')
+    return digest
+
+@lru_cache(maxsize=256)
+def readBlob(digest: str) -> tuple[int, bytes]:
+    # the pickle stream and buffer count; the buffers themselves are mapped afresh on every load
+    with open(f'{blobDir()}/{digest}.pkl', 'rb') as f:
+        return pickle.load(f)
+
+def getBlob(digest: str):
+    # a new object on every call, whose arrays are private copy-on-write maps of the blob
+    path = f'{blobDir()}/{digest}'
+    count, data = readBlob(digest)
+    buffers = []
+    for i in range(count):
+        if os.path.getsize(f'{path}.{i}.buf') == 0:
+            buffers += [bytearray()]
+        else:
+            buffers += [np.memmap(f'{path}.{i}.buf', dtype=np.uint8, mode='c')]
+    return pickle.loads(data, buffers=buffers)
+
+class SpectrumRef:
+    # stands in for an r.spectrum/r.Lifetime/r.esdSpectrum in the spectra frame. attribute access
+    # (reads and writes) is forwarded to the ref's own copy of the stored object, which is only
+    # read from the blob store on first use. only the digest is pickled with the frame
+    obj = None
+
+    def __init__(self, digest: str) -> None:
+        self.digest = digest
+
+    def __getattr__(self, name: str):
+        if name == 'digest' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        if name in ['digest', 'obj']:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.load(), name, value)
+
+    def __getstate__(self) -> dict:
+        return {'digest': self.digest}
+
+    def __repr__(self) -> str:
+        return f'SpectrumRef({self.digest[:12]})'
+
+    def load(self):
+        if self.obj is None:
+            self.obj = getBlob(self.digest)
+        return self.obj
+
+def mapCells(df: pd.DataFrame, func) -> pd.DataFrame:
+    # DataFrame.map is applymap's name from pandas 2.1 on
+    return df.map(func) if hasattr(df, 'map') else df.applymap(func)
+
+def externalise(df: pd.DataFrame) -> pd.DataFrame:
+    # moves any full spectrum object in the frame into the blob store, leaving a reference behind.
+    # refs whose object was loaded are stored again in case it was changed, which keeps the same
+    # digest (and costs no write) when it wasn't
+    def reference(x):
+        if x is None or (isinstance(x, float) and x != x):
+            return x
+        if isinstance(x, SpectrumRef):
+            return x if x.obj is None else SpectrumRef(putBlob(x.obj))
+        return SpectrumRef(putBlob(x))
+    return mapCells(df, reference)
+
+def migrate() -> None:
+    # one-shot conversion of a spectra pickle that still holds whole objects
+    from .storeFuncs import framePath, storeFrames
+    df = pd.read_pickle(framePath('spectra'))
+    storeFrames({'spectra': df})
+    print(f'Moved {df.notnull().to_numpy().sum()} spectra into {blobDir()}')
+
+if __name__ == '__main__':
+    # python -m sharedFuncs.blobStore
+    migrate()
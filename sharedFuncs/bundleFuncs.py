@@ -0,0 +1,61 @@
+import os
+import pickle
+import hashlib
+import resources as r
+from threading import Lock
+
+# {cluster: {job name: bundle name}} for every job packed into a bundle (an array job or multi-job
+# script), so status checks can find a member through the bundle's entry in the scheduler queue.
+# entries are dropped once their bundle has left the queue
+bundleLock = Lock()
+
+def bundlePath() -> str:
+    return f'{r.loadConfig().local.dbLocationMac}/bundles'
+
+def readAllBundles() -> dict[str, dict[str, str]]:
+    try:
+        with open(bundlePath(), 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return {}
+
+def readBundles(cluster_choice) -> dict[str, str]:
+    return readAllBundles().get(str(cluster_choice), {})
+
+def writeBundles(bundles: dict[str, dict[str, str]]) -> None:
+    with open(f'{bundlePath()}.tmp', 'wb') as f:
+        pickle.dump(bundles, f)
+    os.replace(f'{bundlePath()}.tmp', bundlePath())
+
+def recordBundle(cluster_choice, bundleName: str, jobNames: list[str]) -> None:
+    with bundleLock:
+        bundles = readAllBundles()
+        bundles.setdefault(str(cluster_choice), {}).update({jobName: bundleName for jobName in jobNames})
+        writeBundles(bundles)
+
+def pruneBundles(cluster_choice, queue: dict) -> dict[str, str]:
+    # the cluster's entries whose bundle is still in its queue; the rest are finished (or gone)
+    # and their members are found through their own output from here on
+    with bundleLock:
+        bundles = readAllBundles()
+        current = bundles.get(str(cluster_choice), {})
+        live = {jobName: bundleName for jobName, bundleName in current.items() if bundleName in queue}
+        if len(live) != len(current):
+            bundles[str(cluster_choice)] = live
+            writeBundles(bundles)
+        return live
+
+def bundleName(jobNames: list[str]) -> str:
+    return f'bundle-{hashlib.sha1("|".join(sorted(jobNames)).encode()).hexdigest()[:12]}'
+
+def packKey(job) -> tuple:
+    # only jobs that ask the scheduler for the same allocation can share a submission
+    return (job.procs, job.mem, job.time)
+
+def packJobs(jobs: list[tuple], size: int) -> list[list[tuple]]:
+    # (key, job) pairs of a single metajob grouped by packKey, in order, and cut into packs of at
+    # most size
+    groups = {}
+    for key, job in jobs:
+        groups.setdefault(packKey(job), []).append((key, job))
+    return [group[i:i + size] for group in groups.values() for i in range(0, len(group), size)]
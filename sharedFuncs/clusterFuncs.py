@@ -0,0 +1,183 @@
+import re
+import json
+import shlex
+import hashlib
+import resources as r
+from threading import Lock, local
+
+# scheduler states that still hold a job, by scheduler
+queueStates = {
+    'slurm': {'PENDING': r.Status.queued, 'CONFIGURING': r.Status.queued, 'REQUEUED': r.Status.queued,
+              'RUNNING': r.Status.running, 'COMPLETING': r.Status.running},
+    'pbs': {'Q': r.Status.queued, 'H': r.Status.queued, 'W': r.Status.queued, 'T': r.Status.queued,
+            'R': r.Status.running, 'E': r.Status.running, 'B': r.Status.running},
+}
+
+# lines only a normally terminated output has, by the programs the jobs run
+terminationMarkers = ['ORCA TERMINATED NORMALLY', 'Normal termination of Gaussian']
+# job directories per command when listing outputs, keeping each command well under the remote
+# shell's limit on the length of a single argument
+outputChunk = 200
+
+# GB per unit of the memory figures the schedulers report, bytes when there's no unit
+memoryUnits = {'': 2**-30, 'k': 2**-20, 'm': 2**-10, 'g': 1, 't': 2**10}
+
+def memoryGB(text: str) -> float | None:
+    match = re.fullmatch(r'([\d.]+)([kmgt]?)b?', text.strip().lower())
+    return None if match == None else float(match[1])*memoryUnits[match[2]]
+
+class ClusterSession:
+    # a cluster handler (r.clusterHandler unless given) plus the calls that look at a whole cluster
+    # at once instead of one job at a time. these run as shell commands over the handler's own
+    # connection, against whichever scheduler the cluster has; everything else is the handler's
+    def __init__(self, cluster_choice, handler=None) -> None:
+        self.cluster_choice = cluster_choice
+        self.handler = (r.clusterHandler if handler == None else handler)(cluster_choice)
+        self.clu = None
+        self.schedulerName = None
+
+    def __enter__(self) -> 'ClusterSession':
+        self.clu = self.handler.__enter__()
+        return self
+
+    def __exit__(self, a, b, c) -> None:
+        return self.handler.__exit__(a, b, c)
+
+    def __getattr__(self, name: str):
+        return getattr(self.__dict__.get('clu'), name)
+
+    def run(self, command: str) -> str:
+        # stdout of a shell command on the cluster, through the handler's run(command) or the
+        # paramiko client it holds
+        if hasattr(self.clu, 'run'):
+            return self.clu.run(command)
+        if hasattr(self.clu, 'ssh'):
+            _, stdout, _ = self.clu.ssh.exec_command(command)
+            return stdout.read().decode()
+        raise NotImplementedError(f'{type(self.clu).__name__} cannot run commands on the cluster')
+
+    def scheduler(self) -> str:
+        if self.schedulerName == None:
+            self.schedulerName = self.run('if command -v sbatch >/dev/null; then echo slurm; elif command -v qsub >/dev/null; then echo pbs; fi').strip()
+        if self.schedulerName not in queueStates:
+            raise NotImplementedError('no supported scheduler on the cluster')
+        return self.schedulerName
+
+    def queueStatus(self) -> dict[str, r.Status]:
+        # {job name: queued or running} for everything the scheduler holds for this user, from a
+        # single listing. array tasks share their job's name, which is running if any task is
+        scheduler = self.scheduler()
+        if scheduler == 'slurm':
+            entries = [line.rsplit('|', 1) for line in self.run("squeue -h -u $USER -o '%j|%T'").splitlines() if '|' in line]
+        else:
+            jobs = json.loads(self.run('qselect -u $USER | xargs -r qstat -f -F json') or '{}').get('Jobs', {})
+            entries = [(job['Job_Name'], job['job_state']) for job in jobs.values()]
+        queue = {}
+        for name, state in entries:
+            status = queueStates[scheduler].get(state.strip())
+            if status != None and queue.get(name) != r.Status.running:
+                queue[name] = status
+        return queue
+
+    def finishedJobs(self, jobs: list[r.Job]) -> set[str]:
+        # names of the jobs whose directory holds a normally terminated output, from one grep per
+        # outputChunk jobs. binary files (checkpoints, orbitals) are skipped unread
+        markers = ' '.join(f'-e {shlex.quote(i)}' for i in terminationMarkers)
+        finished = set()
+        for start in range(0, len(jobs), outputChunk):
+            directories = {f'{job.path}/{job.name}': job.name for job in jobs[start:start + outputChunk]}
+            listing = self.run(f'for d in {" ".join(shlex.quote(i) for i in directories)}; do grep -qIs {markers} "$d"/* && echo "$d"; done')
+            finished |= {directories[line] for line in listing.splitlines() if line in directories}
+        return finished
+
+    def outputFingerprint(self, job: r.Job) -> str | None:
+        # digest of the names, sizes and mtimes of everything in the job's directory, so it changes
+        # whenever the output does. None until the directory has something in it
+        listing = self.run(f'stat -c "%n %s %Y" {shlex.quote(f"{job.path}/{job.name}")}/* 2>/dev/null')
+        if listing.strip() == '':
+            return None
+        return hashlib.sha1(listing.encode()).hexdigest()
+
+    def usageHistory(self) -> dict[str, dict]:
+        # {job name: {'hours', 'mem' (GB), 'procs'}} of the last successful run of every job the
+        # scheduler's accounting holds for this user, from a single listing. jobs run inside a
+        # bundle are accounted under the bundle's name and so have none
+        usage = {}
+        if self.scheduler() == 'slurm':
+            rows = [line.split('|') for line in self.run('sacct -n -P -u $USER -S now-90days -o JobID,JobName,State,ElapsedRaw,AllocCPUS,MaxRSS').splitlines()
+                    if line.count('|') == 5]
+            mem = {}
+            for jobID, _, _, _, _, maxRSS in rows:
+                if '.' in jobID and memoryGB(maxRSS) != None:
+                    parent = jobID.split('.')[0]
+                    mem[parent] = max(mem.get(parent, 0), memoryGB(maxRSS))
+            for jobID, name, state, elapsed, procs, _ in rows:
+                if '.' not in jobID and state == 'COMPLETED' and jobID in mem:
+                    usage[name] = {'hours': int(elapsed)/3600, 'mem': mem[jobID], 'procs': int(procs)}
+            return usage
+
+        jobs = json.loads(self.run('qselect -x -s F -u $USER | xargs -r qstat -xf -F json') or '{}').get('Jobs', {})
+        for record in jobs.values():
+            used = record.get('resources_used', {})
+            if record.get('Exit_status') != 0 or 'walltime' not in used or memoryGB(used.get('mem', '')) == None:
+                continue
+            hours, minutes, seconds = [int(i) for i in used['walltime'].split(':')]
+            usage[record['Job_Name']] = {'hours': hours + minutes/60 + seconds/3600, 'mem': memoryGB(used['mem']),
+                                         'procs': int(record['Resource_List']['ncpus'])}
+        return usage
+
+    def canBundle(self) -> bool:
+        try:
+            return self.scheduler() == 'slurm'
+        except NotImplementedError:
+            return False
+
+    def submitBundle(self, name: str, jobs: list[r.Job]) -> str:
+        # submits jobs already built with submit=False as one SLURM array job named name, each task
+        # running its job's own script in the job's directory. the allocation and the rest of the
+        # #SBATCH header come from the first member's script, which every member shares (packKey).
+        # raises unless the scheduler took it
+        if not self.canBundle():
+            raise NotImplementedError('bundles are submitted as SLURM job arrays')
+        directories = [f'{job.path}/{job.name}' for job in jobs]
+        own = ['--job-name', '--output', '--error', '--array', '-J ', '-o ', '-e ', '-a ']
+        header = self.run(f"grep -h '^#SBATCH' {shlex.quote(directories[0])}/* 2>/dev/null").splitlines()
+        header = [line for line in dict.fromkeys(header) if not any(option in line for option in own)]
+        if len(header) == 0:
+            raise RuntimeError(f'no job script found in {directories[0]}')
+        path = f'{jobs[0].path}/{name}.sbatch'
+        script = '\n'.join(['#!/bin/bash', f'#SBATCH --job-name={name}', f'#SBATCH --array=0-{len(jobs) - 1}',
+                            f'#SBATCH --output={jobs[0].path}/{name}_%a.out'] + header +
+                           [f'directories=({" ".join(shlex.quote(i) for i in directories)})',
+                            'cd "${directories[$SLURM_ARRAY_TASK_ID]}"',
+                            "bash \"$(grep -l '^#SBATCH' * | head -n 1)\""])
+        jobID = self.run(f"cat > {shlex.quote(path)} <<'BUNDLE'\n{script}\nBUNDLE\nsbatch --parsable {shlex.quote(path)}").strip()
+        if not jobID.split(';')[0].isdigit():
+            raise RuntimeError(f'sbatch did not take {path}')
+        return f'Submitted {name} as array job {jobID}'
+
+class ThreadHandlers:
+    # lazily opens one cluster session per worker thread, closing them all on exit
+    def __init__(self, handler, cluster_choice) -> None:
+        self.handler = handler
+        self.cluster_choice = cluster_choice
+        self.threadData = local()
+        self.opened = []
+        self.lock = Lock()
+
+    def __enter__(self) -> 'ThreadHandlers':
+        return self
+
+    def __exit__(self, a, b, c) -> None:
+        for handler in self.opened:
+            handler.__exit__(None, None, None)
+
+    def get(self) -> ClusterSession:
+        if not hasattr(self.threadData, 'clu'):
+            # only connections that actually opened are closed on exit
+            handler = ClusterSession(self.cluster_choice, self.handler)
+            clu = handler.__enter__()
+            with self.lock:
+                self.opened.append(handler)
+            self.threadData.clu = clu
+        return self.threadData.clu
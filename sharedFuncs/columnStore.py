@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+import resources as r
+from enum import Enum
+from functools import cache
+
+# numeric frames that can live in the embedded SQLite store instead of a whole-file pickle.
+# each frame is one table with a TEXT column per index level and a REAL column per solvent,
+# keyed on the index levels. tuple-valued cells (transition dipoles, polarisability tensors)
+# are held in the same row: a REAL column per component ('<solvent>:0', '<solvent>:1', ...,
+# added as wider vectors come in) and their length in '<solvent>:n', NULL for scalar cells.
+# the solvent's own column holds the vector's norm, so numeric views can read every cell as a
+# float without touching the components
+columnFrames = ['dataset', 'comp-freq', 'comp-em', 'comp-ex', 'comp-casscf', 'comp-pol']
+
+def dbPath() -> str:
+    return f'{r.loadConfig().local.dbLocationMac}/datasets.sqlite'
+
+def exists() -> bool:
+    return os.path.exists(dbPath())
+
+# bumped whenever stores written by older code need upgrading when they're next opened (upgrade)
+schemaVersion = 2
+
+def connect() -> sqlite3.Connection:
+    # creates the store if there isn't one; readers check exists() first
+    conn = sqlite3.connect(dbPath())
+    conn.execute('CREATE TABLE IF NOT EXISTS frames (name TEXT PRIMARY KEY, levels TEXT, columns TEXT)')
+    if conn.execute('PRAGMA user_version').fetchone()[0] < schemaVersion:
+        upgrade(conn)
+    return conn
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    # 1 -> 2: components move from the long '<frame>:vec' tables into component columns.
+    # 0 -> 1: frames stored before the norms were kept alongside their components have NULL there.
+    # the version is checked again under the write lock, so only one of several openers does it
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        stored = [i for i in columnFrames if isStored(i, conn)]
+        if version < 2:
+            unstack(conn, stored)
+        if version < 1:
+            fillNorms(conn, stored)
+        conn.execute(f'PRAGMA user_version = {schemaVersion}')
+
+def encode(value) -> str:
+    if isinstance(value, Enum):
+        return f'{type(value).__name__}.{value.name}'
+    return str(value)
+
+@cache
+def codecTable() -> dict[str, object]:
+    enums = [r.Fluorophores, r.States, r.MetaJobs, r.Solvents, r.spectraType,
+             r.Energy.Freq, r.Energy.Emission, r.Energy.Excitation, r.Energy.CASSCF, r.Energy.Polarisability]
+    return {encode(member): member for enum in enums for member in enum}
+
+def decode(text: str):
+    return codecTable().get(text, text)
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def levelNames(df: pd.DataFrame) -> list[str]:
+    return [name if name != None else f'level{i}' for i, name in enumerate(df.index.names)]
+
+def splitValue(value) -> tuple[float | None, list[float] | None]:
+    # (scalar, components) for a cell, where the scalar of a vector is its norm and nested
+    # tensors are flattened; missing values are (None, None)
+    if isinstance(value, (tuple, list, np.ndarray)):
+        components = np.asarray(value, dtype=float).ravel()
+        return float(np.linalg.norm(components)), components.tolist()
+    if value == None or pd.isna(value):
+        return None, None
+    return float(value), None
+
+def isStored(dfName: str, conn: sqlite3.Connection = None) -> bool:
+    if conn == None and not exists():
+        return False
+    close = conn == None
+    conn = connect() if conn == None else conn
+    try:
+        return conn.execute('SELECT 1 FROM frames WHERE name = ?', (dfName,)).fetchone() != None
+    finally:
+        if close:
+            conn.close()
+
+def componentWidths(conn: sqlite3.Connection, dfName: str) -> dict[str, int]:
+    # {encoded solvent: number of component columns} for the solvents that have any
+    widths = {}
+    for record in conn.execute(f'PRAGMA table_info({quote(dfName)})'):
+        solvent, _, component = record[1].rpartition(':')
+        if solvent != '' and component.isdigit():
+            widths[solvent] = max(widths.get(solvent, 0), int(component) + 1)
+    return widths
+
+def widen(conn: sqlite3.Connection, dfName: str, widths: dict[str, int]) -> dict[str, int]:
+    # adds component columns until each solvent has at least widths[solvent], returns the new widths
+    current = componentWidths(conn, dfName)
+    for solvent, width in widths.items():
+        if width > 0 and solvent not in current:
+            conn.execute(f'ALTER TABLE {quote(dfName)} ADD COLUMN {quote(f"{solvent}:n")} INTEGER')
+        for component in range(current.get(solvent, 0), width):
+            conn.execute(f'ALTER TABLE {quote(dfName)} ADD COLUMN {quote(f"{solvent}:{component}")} REAL')
+        if width > 0:
+            current[solvent] = max(current.get(solvent, 0), width)
+    return current
+
+def componentColumns(solvent: str, width: int) -> list[str]:
+    return [f'{solvent}:n'] + [f'{solvent}:{component}' for component in range(width)]
+
+def componentValues(components: list[float] | None, width: int) -> list:
+    # the values for componentColumns, padded with NULL
+    if components == None:
+        return [None]*(width + 1)
+    return [len(components)] + components + [None]*(width - len(components))
+
+def writeRows(conn: sqlite3.Connection, dfName: str, df: pd.DataFrame, rows: pd.Index) -> None:
+    levels = levelNames(df)
+    columns = [encode(i) for i in df.columns]
+    records, needed = [], {}
+    for key, values in zip(rows, df.loc[rows].itertuples(index=False, name=None)):
+        cells = [splitValue(value) for value in values]
+        for solvent, (_, components) in zip(columns, cells):
+            if components != None:
+                needed[solvent] = max(needed.get(solvent, 0), len(components))
+        records += [([encode(i) for i in (key if isinstance(key, tuple) else (key,))], cells)]
+    widths = widen(conn, dfName, needed)
+    vectorColumns = [i for i in columns if i in widths]
+
+    names = levels + columns + [name for solvent in vectorColumns for name in componentColumns(solvent, widths[solvent])]
+    upsert = f'INSERT INTO {quote(dfName)} ({", ".join(quote(i) for i in names)}) VALUES ({", ".join("?"*len(names))}) '\
+             f'ON CONFLICT ({", ".join(quote(i) for i in levels)}) DO UPDATE SET {", ".join(f"{quote(i)} = excluded.{quote(i)}" for i in names[len(levels):])}'
+    values = []
+    for key, cells in records:
+        row = key + [scalar for scalar, _ in cells]
+        for solvent, (_, components) in zip(columns, cells):
+            if solvent in widths:
+                row += componentValues(components, widths[solvent])
+        values += [row]
+    conn.executemany(upsert, values)
+
+def writeFrame(conn: sqlite3.Connection, dfName: str, df: pd.DataFrame) -> None:
+    # full rewrite of one frame, run inside the caller's transaction
+    levels = levelNames(df)
+    columns = [encode(i) for i in df.columns]
+    keys = ', '.join(quote(i) for i in levels)
+    conn.execute(f'DROP TABLE IF EXISTS {quote(dfName)}')
+    conn.execute(f'CREATE TABLE {quote(dfName)} ({", ".join(f"{quote(i)} TEXT" for i in levels)}, '
+                 f'{"".join(f"{quote(i)} REAL, " for i in columns)}PRIMARY KEY ({keys}))')
+    conn.execute('INSERT OR REPLACE INTO frames VALUES (?, ?, ?)', (dfName, json.dumps(levels), json.dumps(columns)))
+    writeRows(conn, dfName, df, df.index)
+
+def writeChanges(conn: sqlite3.Connection, dfName: str, old: pd.DataFrame, new: pd.DataFrame, filtered: bool = False) -> None:
+    # only rewrites the rows that differ from what was read, unless the shape of the frame changed.
+    # a filtered read only holds part of the frame, so its shape can't change
+    if old is None or not (old.index.equals(new.index) and old.columns.equals(new.columns)):
+        if filtered:
+            raise ValueError(f'rows or columns of a filtered read of {dfName} were added or removed')
+        writeFrame(conn, dfName, new)
+        return
+    same = (old == new) | (old.isna() & new.isna())
+    changed = new.index[~same.to_numpy().all(axis=1)]
+    if len(changed) > 0:
+        writeRows(conn, dfName, new, changed)
+
+def readFrame(dfName: str, rows: dict[str, list] = None, columns: list = None, conn: sqlite3.Connection = None, vectors: bool = True) -> pd.DataFrame:
+    # filtered read: rows maps index level names to the values to keep, columns picks solvents
+    # (kept in the frame's own order). only the matching rows are read. without vectors the frame stays all float, with the norms in place of tuple-valued cells.
+    # with vectors it comes back as object, like the pickles, so tuples can be written into any cell
+    close = conn == None
+    conn = connect() if conn == None else conn
+    try:
+        levels, storedColumns = [json.loads(i) for i in conn.execute('SELECT levels, columns FROM frames WHERE name = ?', (dfName,)).fetchone()]
+        columns = storedColumns if columns == None else [i for i in storedColumns if i in {encode(j) for j in columns}]
+        where, params = [], []
+        for level, values in ({} if rows == None else rows).items():
+            where += [f'{quote(level)} IN ({", ".join("?"*len(values))})']
+            params += [encode(i) for i in values]
+        whereSQL = f' WHERE {" AND ".join(where)}' if len(where) > 0 else ''
+
+        widths = componentWidths(conn, dfName) if vectors else {}
+        vectorColumns = [i for i in columns if i in widths]
+        names = levels + columns + [name for solvent in vectorColumns for name in componentColumns(solvent, widths[solvent])]
+        records = conn.execute(f'SELECT {", ".join(quote(i) for i in names)} FROM {quote(dfName)}{whereSQL} ORDER BY rowid', params).fetchall()
+        index = pd.MultiIndex.from_tuples([tuple(decode(i) for i in record[:len(levels)]) for record in records], names=levels)
+        df = pd.DataFrame([record[len(levels):len(levels) + len(columns)] for record in records], index=index, columns=[decode(i) for i in columns], dtype=float)
+        if not vectors:
+            return df
+
+        block = np.array([record[len(levels) + len(columns):] for record in records], dtype=float).reshape(len(records), -1)
+        df = df.astype(object)
+        start = 0
+        for solvent in vectorColumns:
+            lengths, components = block[:, start], block[:, start + 1:start + 1 + widths[solvent]]
+            column = columns.index(solvent)
+            for row in np.flatnonzero(~np.isnan(lengths)):
+                df.iat[row, column] = tuple(components[row, :int(lengths[row])].tolist())
+            start += 1 + widths[solvent]
+        return df
+    finally:
+        if close:
+            conn.close()
+
+def readComponents(dfName: str, rows: dict[str, list] = None, columns: list = None, conn: sqlite3.Connection = None) -> pd.DataFrame:
+    # the component columns as they're stored: a float frame with a (solvent, component) column per
+    # component, for the rows holding at least one vector. shorter vectors are padded with NaN
+    close = conn == None
+    conn = connect() if conn == None else conn
+    try:
+        levels, storedColumns = [json.loads(i) for i in conn.execute('SELECT levels, columns FROM frames WHERE name = ?', (dfName,)).fetchone()]
+        columns = storedColumns if columns == None else [i for i in storedColumns if i in {encode(j) for j in columns}]
+        widths = componentWidths(conn, dfName)
+        vectorColumns = [i for i in columns if i in widths]
+        names = [f'{solvent}:{component}' for solvent in vectorColumns for component in range(widths[solvent])]
+        anyVector = ' OR '.join(f'{quote(solvent + ":n")} IS NOT NULL' for solvent in vectorColumns)
+        where, params = [f'({anyVector if len(vectorColumns) > 0 else "0"})'], []
+        for level, values in ({} if rows == None else rows).items():
+            where += [f'{quote(level)} IN ({", ".join("?"*len(values))})']
+            params += [encode(i) for i in values]
+        records = conn.execute(f'SELECT {", ".join(quote(i) for i in levels + names)} FROM {quote(dfName)} WHERE {" AND ".join(where)} ORDER BY rowid', params).fetchall()
+        index = pd.MultiIndex.from_tuples([tuple(decode(i) for i in record[:len(levels)]) for record in records], names=levels)
+        header = pd.MultiIndex.from_tuples([(decode(solvent), component) for solvent in vectorColumns for component in range(widths[solvent])],
+                                           names=['solvent', 'component'])
+        return pd.DataFrame([record[len(levels):] for record in records], index=index, columns=header, dtype=float)
+    finally:
+        if close:
+            conn.close()
+
+def fillNorms(conn: sqlite3.Connection, dfNames: list[str]) -> None:
+    # recomputes the norms of the tuple-valued cells from their components
+    for dfName in dfNames:
+        for solvent, width in componentWidths(conn, dfName).items():
+            components = ', '.join(quote(f'{solvent}:{component}') for component in range(width))
+            records = conn.execute(f'SELECT rowid, {components} FROM {quote(dfName)} WHERE {quote(solvent + ":n")} IS NOT NULL').fetchall()
+            if len(records) == 0:
+                continue
+            block = np.array(records, dtype=float)
+            norms = np.sqrt(np.nansum(block[:, 1:]**2, axis=1))
+            conn.executemany(f'UPDATE {quote(dfName)} SET {quote(solvent)} = ? WHERE rowid = ?',
+                             [(float(norm), int(rowid)) for norm, rowid in zip(norms, block[:, 0])])
+
+def unstack(conn: sqlite3.Connection, dfNames: list[str]) -> None:
+    # moves the components of stores written before they had their own columns out of the long
+    # '<frame>:vec' tables (a row per component) and drops those
+    for dfName in dfNames:
+        if conn.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (dfName + ':vec',)).fetchone() == None:
+            continue
+        levels = json.loads(conn.execute('SELECT levels FROM frames WHERE name = ?', (dfName,)).fetchone()[0])
+        records = pd.DataFrame(conn.execute(f'SELECT * FROM {quote(dfName + ":vec")} ORDER BY component').fetchall(),
+                               columns=levels + ['solvent', 'component', 'value'])
+        widths = widen(conn, dfName, (records.groupby('solvent')['component'].max() + 1).to_dict())
+        keyWhere = ' AND '.join(f'{quote(i)} = ?' for i in levels)
+        for solvent, group in records.groupby('solvent', sort=False):
+            assignments = ', '.join(f'{quote(i)} = ?' for i in componentColumns(solvent, widths[solvent]))
+            conn.executemany(f'UPDATE {quote(dfName)} SET {assignments} WHERE {keyWhere}',
+                             [componentValues(cell['value'].tolist(), widths[solvent]) + list(key)
+                              for key, cell in group.groupby(levels, sort=False)])
+        conn.execute(f'DROP TABLE {quote(dfName + ":vec")}')
+
+def backfillNorms(dfNames: list[str] = columnFrames) -> None:
+    # stores are upgraded when first opened (connect), this redoes it on demand
+    with connect() as conn:
+        dfNames = [i for i in dfNames if isStored(i, conn)]
+        fillNorms(conn, dfNames)
+    for dfName in dfNames:
+        print(f'Backfilled norms for {dfName}')
+
+def setCell(dfName: str, key: tuple, solvent, value) -> None:
+    with connect() as conn:
+        levels = json.loads(conn.execute('SELECT levels FROM frames WHERE name = ?', (dfName,)).fetchone()[0])
+        keyWhere = ' AND '.join(f'{quote(i)} = ?' for i in levels)
+        encodedKey = [encode(i) for i in key]
+        scalar, components = splitValue(value)
+        solvent = encode(solvent)
+        width = widen(conn, dfName, {solvent: 0 if components == None else len(components)}).get(solvent, 0)
+        names = [solvent] + (componentColumns(solvent, width) if width > 0 else [])
+        values = [scalar] + (componentValues(components, width) if width > 0 else [])
+        conn.execute(f'UPDATE {quote(dfName)} SET {", ".join(f"{quote(i)} = ?" for i in names)} WHERE {keyWhere}', values + encodedKey)
+
+def migrate(dfNames: list[str] = columnFrames) -> None:
+    # one-shot copy of the existing pickles into the store; the pickles are left in place
+    from .storeFuncs import framePath
+    with connect() as conn:
+        for dfName in dfNames:
+            writeFrame(conn, dfName, pd.read_pickle(framePath(dfName)))
+            print(f'Migrated {dfName}')
+
+if __name__ == '__main__':
+    # python -m sharedFuncs.columnStore [frame ...]
+    # python -m sharedFuncs.columnStore norms [frame ...]
+    if len(sys.argv) > 1 and sys.argv[1] == 'norms':
+        backfillNorms(sys.argv[2:] if len(sys.argv) > 2 else columnFrames)
+    else:
+        migrate(sys.argv[1:] if len(sys.argv) > 1 else columnFrames)
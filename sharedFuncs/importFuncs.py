@@ -0,0 +1,17 @@
+import sys
+import importlib.util
+
+def lazyModule(name: str):
+    # module object whose import only runs on first attribute access, for the heavy dependencies
+    # (rdkit, seaborn) that only a few buttons need
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec == None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,23 @@
+from pandas import DataFrame
+from threading import Lock
+
+# index metadata keyed on the identity of a frame's index and columns. pandas swaps in a new
+# Index object whenever rows/columns are added or dropped, so a changed frame never hits a
+# stale entry; holding the objects here keeps their ids from being reused while cached
+cacheSize = 32
+indexCache = {}
+indexCacheLock = Lock()
+
+def extractIndices(df: DataFrame) -> list[list]:
+    # [columns, level 0 values, level 1 values, ...], each in order of first appearance
+    key = (id(df.index), id(df.columns))
+    with indexCacheLock:
+        cached = indexCache.get(key)
+    if cached == None or cached[0] is not df.index or cached[1] is not df.columns:
+        lists = [df.columns.to_list()] + [df.index.unique(level=i).to_list() for i in range(df.index.nlevels)]
+        cached = (df.index, df.columns, lists)
+        with indexCacheLock:
+            if len(indexCache) >= cacheSize:
+                del indexCache[next(iter(indexCache))]
+            indexCache[key] = cached
+    return [list(i) for i in cached[2]]
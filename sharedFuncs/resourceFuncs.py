@@ -0,0 +1,119 @@
+import os
+import sys
+import math
+import numpy as np
+import pandas as pd
+import resources as r
+from functools import cache
+
+# history of what finished jobs actually used, one row per (fluorophore, state, metajob, solvent)
+# with the features the estimates are made from. filled in by manageDS's pull from the scheduler's
+# accounting (ClusterSession.usageHistory() -> {job name: {'hours': ..., 'mem': ..., 'procs': ...}})
+historyColumns = ['fluorophore', 'state', 'metajob', 'solvent', 'atoms', 'rank', 'solvated', 'procs', 'mem', 'hours']
+# fewest finished jobs a group needs before it gets its own fit
+minSamples = 5
+# estimates are padded up to this quantile of the group's residuals, so few jobs run out
+coverage = 0.9
+
+def historyPath() -> str:
+    return f'{r.loadConfig().local.dbLocationMac}/resources.history'
+
+def readHistory() -> pd.DataFrame:
+    if not os.path.exists(historyPath()):
+        return pd.DataFrame(columns=historyColumns)
+    return pd.read_pickle(historyPath())
+
+@cache
+def heavyAtoms(smiles: str) -> int | None:
+    # None for SMILES rdkit can't parse, which leaves the job without an estimate
+    from rdkit import Chem
+    mol = Chem.MolFromSmiles(smiles)
+    return None if mol == None else mol.GetNumHeavyAtoms()
+
+def features(job, fluorophore, metajob, solvent) -> dict:
+    return {'atoms': heavyAtoms(fluorophore.smiles), 'rank': str(job.method.rank), 'metajob': str(metajob), 'solvated': solvent != r.Solvents.gas}
+
+def recordUsage(records: list[dict]) -> None:
+    # records carry historyColumns; a rerun of a job replaces its earlier row
+    if len(records) == 0:
+        return
+    history = pd.concat([readHistory(), pd.DataFrame(records, columns=historyColumns)], ignore_index=True)
+    history = history.drop_duplicates(subset=['fluorophore', 'state', 'metajob', 'solvent'], keep='last')
+    history.to_pickle(f'{historyPath()}.tmp')
+    os.replace(f'{historyPath()}.tmp', historyPath())
+
+def usableHistory(history: pd.DataFrame) -> pd.DataFrame:
+    # rows the fits can take a log of
+    return history[(history['hours'] > 0) & (history['mem'] > 0) & (history['atoms'] > 0)]
+
+class ResourceModel:
+    # log(hours) and log(mem) fitted linearly against log(heavy atoms), per (metajob, solvated)
+    # group where there's enough history, falling back to (rank, solvated) and then to all jobs.
+    # procs is the median the group ran with
+    def __init__(self, history: pd.DataFrame) -> None:
+        self.fits = {}
+        history = usableHistory(history)
+        for keys in [['metajob', 'solvated'], ['rank', 'solvated']]:
+            for group, rows in history.groupby(keys):
+                if len(rows) >= minSamples:
+                    self.fits[(tuple(keys), group)] = self.fit(rows)
+        if len(history) >= minSamples:
+            self.fits['all'] = self.fit(history)
+
+    def fit(self, rows: pd.DataFrame) -> dict:
+        x = np.log(rows['atoms'].to_numpy(dtype=float))
+        design = np.column_stack([np.ones_like(x), x]) if np.ptp(x) > 0 else np.ones((len(x), 1))
+        fit = {'procs': int(rows['procs'].median())}
+        for column in ['hours', 'mem']:
+            y = np.log(rows[column].to_numpy(dtype=float))
+            coefficients = np.linalg.lstsq(design, y, rcond=None)[0]
+            fit[column] = (coefficients, float(np.quantile(y - design @ coefficients, coverage)))
+        return fit
+
+    def estimate(self, atoms: int, metajob: str, rank: str, solvated: bool) -> dict | None:
+        # {'procs', 'mem', 'hours'} for a job, or None if there's no history (or atom count) to go on
+        if atoms == None:
+            return None
+        for key in [(('metajob', 'solvated'), (metajob, solvated)), (('rank', 'solvated'), (rank, solvated)), 'all']:
+            if key in self.fits:
+                fit = self.fits[key]
+                estimate = {'procs': fit['procs']}
+                for column in ['hours', 'mem']:
+                    coefficients, margin = fit[column]
+                    x = np.array([1.0, math.log(atoms)])[:len(coefficients)]
+                    estimate[column] = math.ceil(math.exp(float(x @ coefficients) + margin))
+                return estimate
+        return None
+
+def evaluate(history: pd.DataFrame, folds: int = 5) -> None:
+    # k-fold check of the model against the recorded history: how far off the time estimates
+    # are, and how often a job would have run out of time or memory
+    history = usableHistory(history)
+    if len(history) < folds:
+        print(f'Only {len(history)} jobs recorded, need at least {folds}')
+        return
+    fold = np.arange(len(history)) % folds
+    results = []
+    for i in range(folds):
+        model = ResourceModel(history[fold != i])
+        for row in history[fold == i].itertuples():
+            estimate = model.estimate(row.atoms, row.metajob, row.rank, row.solvated)
+            if estimate != None:
+                results += [(row.metajob, row.hours, estimate['hours'], row.mem, estimate['mem'])]
+    if len(results) == 0:
+        print('Not enough history for any estimates')
+        return
+    results = pd.DataFrame(results, columns=['metajob', 'hours', 'estHours', 'mem', 'estMem'])
+    results['error'] = np.abs(np.log(results['estHours']/results['hours']))
+    results['timedOut'] = results['hours'] > results['estHours']
+    results['outOfMemory'] = results['mem'] > results['estMem']
+    print(f'{len(results)}/{len(history)} jobs estimated')
+    print(f'median |log(estimated/actual hours)|: {results["error"].median():.2f}')
+    print(f'would have run out of time: {results["timedOut"].mean():.1%}, memory: {results["outOfMemory"].mean():.1%}')
+    print(f'hours requested/used: {results["estHours"].sum():.0f}/{results["hours"].sum():.0f}')
+    print(results.groupby('metajob')[['error', 'timedOut', 'outOfMemory']].mean().to_string())
+
+if __name__ == '__main__':
+    # python -m sharedFuncs.resourceFuncs evaluate
+    if len(sys.argv) > 1 and sys.argv[1] == 'evaluate':
+        evaluate(readHistory())
@@ -0,0 +1,180 @@
+import os
+import fcntl
+import pickle
+import resources as r
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from . import columnStore, blobStore
+from .indexFuncs import extractIndices
+
+def framePath(dfName: str) -> str:
+    return f'{r.loadConfig().local.dbLocationMac}/{dfName}'
+
+def frameVersion(dfName: str) -> int:
+    # changes whenever the stored frame may have changed: the pickle's mtime, or the column
+    # store's for frames held there
+    if dfName in columnStore.columnFrames and columnStore.isStored(dfName):
+        return os.stat(columnStore.dbPath()).st_mtime_ns
+    return os.stat(framePath(dfName)).st_mtime_ns
+
+def readFrame(dfName: str, rows: dict[str, list] = None) -> pd.DataFrame:
+    # rows ({level name: values to keep}) only narrows frames held in the column store, pickles
+    # are always read whole
+    if dfName in columnStore.columnFrames and columnStore.isStored(dfName):
+        return columnStore.readFrame(dfName, rows)
+    return pd.read_pickle(framePath(dfName))
+
+def metaPath() -> str:
+    return f'{r.loadConfig().local.dbLocationMac}/frames.meta'
+
+def readMeta() -> dict[str, tuple[int, list[list]]]:
+    # sidecar of {dfName: (frameVersion when recorded, extractIndices of the frame)}
+    try:
+        with open(metaPath(), 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return {}
+
+def recordMeta(frames: dict[str, pd.DataFrame], columnVersion: int = None) -> None:
+    # columnVersion is the column store's version from before the frames were written: the column
+    # frames that weren't part of the write share the store's file, so their entries are carried
+    # over to its new version as long as nothing else had touched it. the sidecar is shared with
+    # IndexRunner and the other apps, so it's re-read and merged under a file lock, and left alone
+    # when none of its entries change
+    entries = {dfName: (frameVersion(dfName), extractIndices(df)) for dfName, df in frames.items()}
+    with open(f'{metaPath()}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        old = readMeta()
+        meta = dict(old)
+        if columnVersion != None and columnStore.exists():
+            newVersion = os.stat(columnStore.dbPath()).st_mtime_ns
+            for dfName, (version, indices) in old.items():
+                if dfName in columnStore.columnFrames and dfName not in frames and version == columnVersion:
+                    meta[dfName] = (newVersion, indices)
+        meta.update(entries)
+        if meta == old:
+            return
+        with open(f'{metaPath()}.tmp', 'wb') as f:
+            pickle.dump(meta, f)
+        os.replace(f'{metaPath()}.tmp', metaPath())
+
+def indexSummary(dfNames: list[str]) -> dict[str, list[list]]:
+    # extractIndices for the frames whose sidecar entry is still current; stale or missing ones
+    # are left out for the caller to load (see refreshMeta)
+    meta = readMeta()
+    summary = {}
+    for dfName in dfNames:
+        if dfName in meta and meta[dfName][0] == frameVersion(dfName):
+            summary[dfName] = [list(i) for i in meta[dfName][1]]
+    return summary
+
+def refreshMeta(dfNames: list[str]) -> dict[str, list[list]]:
+    with ThreadPoolExecutor(max_workers=max(len(dfNames), 1)) as pool:
+        frames = dict(zip(dfNames, pool.map(readFrame, dfNames)))
+    recordMeta(frames)
+    return {dfName: extractIndices(df) for dfName, df in frames.items()}
+
+def storeFrames(frames: dict[str, pd.DataFrame], originals: dict[str, pd.DataFrame] = None, filtered: list[str] = ()) -> None:
+    # writes several frames together: pickles go to temporary files first (with the spectra
+    # frame's objects moved out to the blob store), frames held in the column store are written
+    # (only their changed rows, given the originals) in a single SQLite transaction, and only
+    # then are the pickles moved over the old ones. a failure up to that point leaves every frame
+    # as it was. the moves are one os.replace per pickle, each atomic on its own, so a crash in the
+    # middle of them can leave some pickles old and others new, with the column store already
+    # committed. the store is only opened if it exists. filtered names the frames that only hold
+    # the rows of a filtered read, which are written back cell for cell and keep their sidecar entry
+    originals = {} if originals == None else originals
+    columnVersion = os.stat(columnStore.dbPath()).st_mtime_ns if columnStore.exists() else None
+    conn = columnStore.connect() if columnStore.exists() else None
+    try:
+        stored = [dfName for dfName in frames if dfName in columnStore.columnFrames and conn != None and columnStore.isStored(dfName, conn)]
+        pickled = [dfName for dfName in frames if dfName not in stored]
+
+        def write(dfName: str) -> str:
+            tmpPath = f'{framePath(dfName)}.tmp'
+            df = blobStore.externalise(frames[dfName]) if dfName == 'spectra' else frames[dfName]
+            df.to_pickle(tmpPath)
+            return tmpPath
+
+        with ThreadPoolExecutor(max_workers=max(len(pickled), 1)) as pool:
+            futures = [pool.submit(write, dfName) for dfName in pickled]
+        try:
+            tmpPaths = [future.result() for future in futures]
+            if len(stored) > 0:
+                with conn:
+                    for dfName in stored:
+                        columnStore.writeChanges(conn, dfName, originals.get(dfName), frames[dfName], dfName in filtered)
+        except Exception:
+            for dfName in pickled:
+                if os.path.exists(f'{framePath(dfName)}.tmp'):
+                    os.remove(f'{framePath(dfName)}.tmp')
+            raise
+    finally:
+        if conn != None:
+            conn.close()
+    for dfName, tmpPath in zip(pickled, tmpPaths):
+        os.replace(tmpPath, framePath(dfName))
+    recordMeta({dfName: df for dfName, df in frames.items() if dfName not in filtered}, columnVersion)
+
+class framesLoad:
+    # a transaction over several frames, yielding {dfName: df}. the frames are read in parallel,
+    # may be edited in place or swapped out in the dict (e.g. for the result of a concat) and are
+    # written back together through storeFrames on exit. if the block raises, none of the stored
+    # frames change. rows ({dfName: {level name: values}}) loads only those rows of the frames held
+    # in the column store, so reading and writing back cost what the block touches; their cells
+    # can be changed but not their rows or columns
+    def __init__(self, dfNames: list[str], rows: dict[str, dict[str, list]] = None) -> None:
+        self.dfNames = list(dict.fromkeys(dfNames))
+        self.rows = {} if rows == None else rows
+        self.frames = {}
+        self.originals = {}
+        self.filtered = []
+
+    def __enter__(self) -> dict[str, pd.DataFrame]:
+        with ThreadPoolExecutor(max_workers=max(len(self.dfNames), 1)) as pool:
+            self.frames.update(zip(self.dfNames, pool.map(lambda dfName: readFrame(dfName, self.rows.get(dfName)), self.dfNames)))
+        for dfName in self.dfNames:
+            if dfName in columnStore.columnFrames:
+                self.originals[dfName] = self.frames[dfName].copy()
+                if dfName in self.rows and columnStore.isStored(dfName):
+                    self.filtered += [dfName]
+        return self.frames
+
+    def __exit__(self, a, b, c) -> None:
+        if a != None:
+            return
+        storeFrames(self.frames, self.originals, self.filtered)
+
+class statusLoad(framesLoad):
+    # r.statusLoad for any backend. pickled frames are still loaded and written by r.statusLoad
+    # itself, with the spectra frame's new objects moved out to the blob store and the sidecar
+    # entry refreshed once it has written. frames held in the column store are loaded like
+    # framesLoad, but written back even if the block raises, as r.statusLoad does, so whatever
+    # was recorded before the error (e.g. jobs already submitted) is kept
+    def __init__(self, df: str) -> None:
+        super().__init__([df])
+        self.dfName = df
+        self.pickled = None
+
+    def __enter__(self) -> pd.DataFrame:
+        if self.dfName in columnStore.columnFrames and columnStore.isStored(self.dfName):
+            return super().__enter__()[self.dfName]
+        self.pickled = r.statusLoad(df=self.dfName)
+        self.frames[self.dfName] = self.pickled.__enter__()
+        return self.frames[self.dfName]
+
+    def __exit__(self, a, b, c):
+        if self.pickled == None:
+            storeFrames(self.frames, self.originals, self.filtered)
+            return
+        df = self.frames[self.dfName]
+        try:
+            if self.dfName == 'spectra':
+                # in place, as r.statusLoad writes the frame it handed out
+                externalised = blobStore.externalise(df)
+                for column in df.columns:
+                    df[column] = externalised[column]
+        finally:
+            suppress = self.pickled.__exit__(a, b, c)
+        recordMeta(self.frames)
+        return suppress
@@ -1,5 +1,6 @@
 import sys
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 from PyQt6.QtWidgets import QApplication
 from functools import partial
 from .funcs.ui import Ui
@@ -59,7 +60,7 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setWindowIcon(qta.icon('fa5s.sliders-h'))
     ui = Ui()
-    with r.statusLoad(df='spectra') as df:
+    with statusLoad(df='spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
 
     populate(ui)
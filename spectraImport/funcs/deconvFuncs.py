@@ -1,4 +1,5 @@
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 import matplotlib.pyplot as plt
 
 import numpy as np
@@ -21,7 +22,7 @@ from .guiFuncs import add_items_combo, setup_QRangeSlider
 from .generalFuncs import extractIndices
 
 def populate_deconv(ui: Ui) -> None:
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
     add_items_combo(ui.deconv_fluorophore, fluorophores)
     add_items_combo(ui.deconv_solvent, solvents)
@@ -104,7 +105,7 @@ def deconv(ui: Ui) -> None:
 def saveDeconv(ui: Ui) -> None:
     fluorophore = ui.deconv_fluorophore.currentData()
     solvent = ui.deconv_solvent.currentData()
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
         if fluorophore in fluorophores and solvent in solvents:
             try:
@@ -234,7 +235,7 @@ def fit(ui: Ui) -> None:
 
 
     # import the spectrum
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         try:
             spectrum = df.at[(fluorophore, spectraType), solvent]
             if spectrum != None:
@@ -1,4 +1,5 @@
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 import numpy as np
 import matplotlib.pyplot as plt
 from functools import partial
@@ -13,7 +14,7 @@ from .ui import Ui
 
 def populate_esd(ui: Ui) -> None:
     init_esd_plot(ui)
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, _ = extractIndices(df)
     add_items_combo(ui.esd_fluorophore, fluorophores)
     add_items_combo(ui.esd_solvent, solvents)
@@ -66,7 +67,7 @@ def esd_browse(ui: Ui) -> None:
 def saveESD(ui: Ui) -> None:
     fluorophore = ui.esd_fluorophore.currentData()
     solvent = ui.esd_solvent.currentData()
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
         if fluorophore in fluorophores and solvent in solvents:
             try:
@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 from pathlib import Path
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 import numpy as np
 from functools import partial
 from scipy.optimize import curve_fit
@@ -15,7 +16,7 @@ from .flExps import FLFuncList, FLLinFuncList
 from .ui import Ui
 
 def populate_fl(ui: Ui) -> None:
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
     add_items_combo(ui.fl_save_fluorophore, fluorophores)
     add_items_combo(ui.fl_save_solvent, solvents)
@@ -102,13 +103,13 @@ def saveToDSFL(ui: Ui) -> None:
     c1 = c1*cScale
     c2 = c2*cScale
 
-    with r.statusLoad('dataset') as df:
+    with statusLoad('dataset') as df:
         df.at[(fluorophore, 'fl1-t'), solvent] = t1
         df.at[(fluorophore, 'fl1-c'), solvent] = c1
         df.at[(fluorophore, 'fl2-t'), solvent] = t2
         df.at[(fluorophore, 'fl2-c'), solvent] = c2
 
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
         if fluorophore in fluorophores and solvent in solvents:
             try:
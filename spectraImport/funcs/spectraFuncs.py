@@ -1,4 +1,5 @@
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 import numpy as np
 import matplotlib.pyplot as plt
 from functools import partial
@@ -13,7 +14,7 @@ from .ui import Ui
 
 def populate_spectra(ui: Ui) -> None:
     init_spectra_plot(ui)
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, _ = extractIndices(df)
     add_items_combo(ui.spectra_fluorophore, fluorophores)
     add_items_combo(ui.spectra_solvent, solvents)
@@ -111,7 +112,7 @@ def clear_fl_plot(ui: Ui) -> None:
 def saveSpectra(ui: Ui) -> None:
     fluorophore = ui.spectra_fluorophore.currentData()
     solvent = ui.spectra_solvent.currentData()
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
         if fluorophore in fluorophores and solvent in solvents:
             try:
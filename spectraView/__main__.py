@@ -1,5 +1,6 @@
 import sys
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 import pandas as pd
 import matplotlib.pyplot as plt
 from PyQt6 import QtWidgets
@@ -11,17 +12,9 @@ from .funcs.lifetimeFuncs import loadFLSpectrum, loadFromDSFL, saveToDSFL
 from .funcs.spectraFuncs import loadSpectrum, loadFromDS, saveToDS, saveToDS_reset
 from .funcs.classes import Ui, SaveLifetimeWindow, SaveSpectrumWindow, PrintDSWindow
 from .funcs.rateLimited import *
+from sharedFuncs.indexFuncs import extractIndices
 import qtawesome as qta
 
-def extractIndices(df: pd.DataFrame) -> list[float]:
-    levels = len(df.index[0])
-    indexLists = [[] for i in range(levels)]
-    for row in df.index:
-        for count, level in enumerate(row):
-            if level not in indexLists[count]:
-                indexLists[count] += [level]
-    return [df.columns.to_list()] + indexLists
-
 def init_spectra_plot(ui: Ui) -> None:
     ui.verticalLayout_spectra = QtWidgets.QVBoxLayout(ui.groupBox_spectra)
     ui.verticalLayout_spectra.setObjectName("verticalLayout_spectra")
@@ -42,7 +35,7 @@ def init_lifetime_plot(ui: Ui) -> None:
 
 def save_lifetime_window(ui: Ui) -> None:
     ui.saveLifetimeWindow = SaveLifetimeWindow()
-    with r.statusLoad(df='spectra') as df:
+    with statusLoad(df='spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
     add_items_combo(ui.saveLifetimeWindow.fluorophore, fluorophores)
     add_items_combo(ui.saveLifetimeWindow.solvent, [i for i in solvents if i != r.Solvents.gas])
@@ -53,7 +46,7 @@ def save_lifetime_window(ui: Ui) -> None:
 
 def save_spectrum_window(ui: Ui) -> None:
     ui.saveSpectrumWindow = SaveSpectrumWindow()
-    with r.statusLoad(df='spectra') as df:
+    with statusLoad(df='spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
     add_items_combo(ui.saveSpectrumWindow.fluorophore, fluorophores)
     add_items_combo(ui.saveSpectrumWindow.solvent, [i for i in solvents if i != r.Solvents.gas])
@@ -65,10 +58,10 @@ def save_spectrum_window(ui: Ui) -> None:
 
 def print_ds(ui: Ui) -> None:
     ui.dsWindow = PrintDSWindow()
-    with r.statusLoad('dataset') as df:
+    with statusLoad('dataset') as df:
         dfOut = df.style.applymap(lambda x: 'color : blue' if (x not in [None, 0.00]) or (pd.isna(x)) else 'color : red').format(precision=3).to_html()
 
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         dfOut += df.notnull().style.applymap(lambda x: 'color : blue' if x else 'color : red').to_html()
 
     ui.dsWindow.dsOut.setHtml(dfOut)
@@ -80,7 +73,7 @@ if __name__ == "__main__":
     app.setWindowIcon(qta.icon('fa5s.chart-area'))
     ui = Ui()
     
-    with r.statusLoad(df='spectra') as df:
+    with statusLoad(df='spectra') as df:
         solvents, fluorophores, spectra = extractIndices(df)
 
     add_items_list(ui.fluorophoreList_widg, fluorophores)
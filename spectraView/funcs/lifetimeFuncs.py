@@ -1,5 +1,6 @@
 import numpy as np
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 from PyQt6.QtWidgets import QMessageBox
 from .guiFuncs import add_items_list_dict, add_items_combo, add_items_combo_dict, add_items_list
 from .classes import Ui
@@ -109,7 +110,7 @@ def loadFromDSFL(ui: Ui) -> None:
     fluorophore = ui.saveLifetimeWindow.fluorophore.currentData()
     solvent = ui.saveLifetimeWindow.solvent.currentData()
 
-    with r.statusLoad('spectra') as df:
+    with statusLoad('spectra') as df:
         fl = df.at[(fluorophore, r.spectraType.lifetime), solvent]
     trfList = []
     try:
@@ -140,7 +141,7 @@ def saveToDSFL(ui: Ui) -> None:
     c1 = c1*cScale
     c2 = c2*cScale
 
-    with r.statusLoad('dataset') as df:
+    with statusLoad('dataset') as df:
         df.at[(fluorophore, 'fl1-t'), solvent] = t1
         df.at[(fluorophore, 'fl1-c'), solvent] = c1
         df.at[(fluorophore, 'fl2-t'), solvent] = t2
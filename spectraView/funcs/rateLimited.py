@@ -1,4 +1,5 @@
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 from datetime import timedelta, datetime
 
 def setup_df():
@@ -13,7 +14,7 @@ class statusLoad_rl:
         if (datetime.now() - self.time_loaded) < timedelta(seconds=timeout) and 'df' in globals():
             self.df = df
         else:
-            with r.statusLoad(dfName) as df_local:
+            with statusLoad(dfName) as df_local:
                 self.df = df_local
                 df_last_load_time = datetime.now()
             df = self.df
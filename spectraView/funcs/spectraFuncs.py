@@ -1,5 +1,6 @@
 import numpy as np
 import resources as r
+from sharedFuncs.storeFuncs import statusLoad
 import matplotlib.pyplot as plt
 from scipy.ndimage import gaussian_filter1d
 from scipy.signal import savgol_filter
@@ -146,7 +147,7 @@ def loadSpectrum(ui: Ui) -> None:
 def loadFromDS(ui: Ui) -> None:
     fluorophore = ui.saveSpectrumWindow.fluorophore.currentData()
     solvent = ui.saveSpectrumWindow.solvent.currentData()
-    with r.statusLoad('dataset') as df:
+    with statusLoad('dataset') as df:
         ui.saveSpectrumWindow.a.setValue(df.at[(fluorophore, 'a'), solvent])
         ui.saveSpectrumWindow.e.setValue(df.at[(fluorophore, 'e'), solvent])
         ui.saveSpectrumWindow.a_g.setValue(df.at[(fluorophore, 'a_g'), solvent])
@@ -158,7 +159,7 @@ def saveToDS(ui: Ui) -> None:
     fluorophore = ui.saveSpectrumWindow.fluorophore.currentData()
     solvent = ui.saveSpectrumWindow.solvent.currentData()
 
-    with r.statusLoad('dataset') as df:
+    with statusLoad('dataset') as df:
         if ui.saveSpectrumWindow.a.value() != 0.0:
             df.at[(fluorophore, 'a'), solvent] = ui.saveSpectrumWindow.a.value()
         if ui.saveSpectrumWindow.e.value() != 0.0:
@@ -177,7 +178,7 @@ def saveToDS_reset(ui: Ui) -> None:
     fluorophore = ui.saveSpectrumWindow.fluorophore.currentData()
     solvent = ui.saveSpectrumWindow.solvent.currentData()
 
-    with r.statusLoad('dataset') as df:
+    with statusLoad('dataset') as df:
         df.at[(fluorophore, 'a'), solvent] = 0.00
         df.at[(fluorophore, 'e'), solvent] = 0.00
         df.at[(fluorophore, 'a_g'), solvent] = 0.00
@@ -0,0 +1,16 @@
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import resources as r
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # points the database at a scratch directory for the length of a test
+    config = types.SimpleNamespace(local=types.SimpleNamespace(dbLocationMac=str(tmp_path)))
+    monkeypatch.setattr(r, 'loadConfig', lambda: config)
+    return tmp_path
@@ -0,0 +1,27 @@
+import types
+import numpy as np
+import pandas as pd
+
+from sharedFuncs.blobStore import SpectrumRef, putBlob, externalise
+
+def make_spectrum() -> types.SimpleNamespace:
+    return types.SimpleNamespace(x=np.linspace(1.0, 2.0, 1000), y=np.ones(1000), label='em')
+
+def test_refs_load_their_own_copy(db):
+    digest = putBlob(make_spectrum())
+    first, second = SpectrumRef(digest), SpectrumRef(digest)
+    first.y[0] = 5.0
+    first.label = 'ex'
+    assert second.y[0] == 1.0
+    assert second.label == 'em'
+    assert SpectrumRef(digest).y[0] == 1.0
+
+def test_externalise_keeps_changes(db):
+    df = externalise(pd.DataFrame([[make_spectrum(), None]], columns=['a', 'b']))
+    digest = df.at[0, 'a'].digest
+    assert externalise(df).at[0, 'a'].digest == digest
+
+    df.at[0, 'a'].label = 'ex'
+    changed = externalise(df).at[0, 'a']
+    assert changed.digest != digest
+    assert SpectrumRef(changed.digest).label == 'ex'
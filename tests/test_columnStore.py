@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import pandas as pd
+import resources as r
+
+from sharedFuncs import columnStore
+from sharedFuncs.storeFuncs import framePath, framesLoad, readFrame, statusLoad
+
+def make_pol() -> pd.DataFrame:
+    fluorophore, state, metajob = list(r.Fluorophores)[0], list(r.States)[0], list(r.MetaJobs)[0]
+    index = pd.MultiIndex.from_tuples([(fluorophore, state, metajob, i) for i in r.Energy.Polarisability],
+                                      names=['Fluorophore', 'State', 'MetaJob', 'Property'])
+    return pd.DataFrame(np.nan, index=index, columns=list(r.Solvents))
+
+def test_tuple_into_migrated_frame(db):
+    make_pol().to_pickle(framePath('comp-pol'))
+    columnStore.migrate(['comp-pol'])
+    key = readFrame('comp-pol').index[0]
+    solvent = list(r.Solvents)[0]
+
+    with framesLoad(['comp-pol']) as dfs:
+        dfs['comp-pol'].at[key, solvent] = (1.0, 2.0, 2.0)
+
+    assert readFrame('comp-pol').at[key, solvent] == (1.0, 2.0, 2.0)
+    assert columnStore.readFrame('comp-pol', vectors=False).at[key, solvent] == 3.0
+
+def test_norms_filled_in_on_first_open(db):
+    make_pol().to_pickle(framePath('comp-pol'))
+    columnStore.migrate(['comp-pol'])
+    key = readFrame('comp-pol').index[0]
+    solvent = list(r.Solvents)[0]
+    with framesLoad(['comp-pol']) as dfs:
+        dfs['comp-pol'].at[key, solvent] = (3.0, 4.0)
+
+    # a store from before the norms were kept: NULL in the scalar column, at version 0
+    conn = columnStore.connect()
+    with conn:
+        conn.execute(f'UPDATE "comp-pol" SET "{columnStore.encode(solvent)}" = NULL')
+        conn.execute('PRAGMA user_version = 0')
+    conn.close()
+
+    assert columnStore.readFrame('comp-pol', vectors=False).at[key, solvent] == 5.0
+
+def test_statusLoad_keeps_stored_changes_made_before_an_error(db):
+    make_pol().to_pickle(framePath('comp-pol'))
+    columnStore.migrate(['comp-pol'])
+    key = readFrame('comp-pol').index[0]
+    solvent = list(r.Solvents)[0]
+    with pytest.raises(RuntimeError):
+        with statusLoad(df='comp-pol') as df:
+            df.at[key, solvent] = 2.0
+            raise RuntimeError
+    assert readFrame('comp-pol').at[key, solvent] == 2.0
+
+def test_long_components_moved_into_columns_on_first_open(db):
+    make_pol().to_pickle(framePath('comp-pol'))
+    columnStore.migrate(['comp-pol'])
+    key = readFrame('comp-pol').index[0]
+    solvent = list(r.Solvents)[0]
+    encodedKey = [columnStore.encode(i) for i in key]
+
+    # a store from before the components had their own columns: a row each in '<frame>:vec'
+    conn = columnStore.connect()
+    with conn:
+        conn.execute('CREATE TABLE "comp-pol:vec" (Fluorophore TEXT, State TEXT, MetaJob TEXT, Property TEXT, solvent TEXT, component INTEGER, value REAL)')
+        conn.executemany('INSERT INTO "comp-pol:vec" VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         [encodedKey + [columnStore.encode(solvent), count, value] for count, value in enumerate([2.0, 3.0, 6.0])])
+        conn.execute(f'UPDATE "comp-pol" SET "{columnStore.encode(solvent)}" = 7.0')
+        conn.execute('PRAGMA user_version = 1')
+    conn.close()
+
+    assert readFrame('comp-pol').at[key, solvent] == (2.0, 3.0, 6.0)
+    assert list(columnStore.readComponents('comp-pol').loc[key, solvent]) == [2.0, 3.0, 6.0]
+    conn = columnStore.connect()
+    assert conn.execute('SELECT 1 FROM sqlite_master WHERE name = ?', ('comp-pol:vec',)).fetchone() == None
+    conn.close()
+
+def test_filtered_load_writes_back_only_its_rows(db):
+    make_pol().to_pickle(framePath('comp-pol'))
+    columnStore.migrate(['comp-pol'])
+    keys = readFrame('comp-pol').index
+    solvent = list(r.Solvents)[0]
+    rows = {'comp-pol': {'Property': [keys[0][3]]}}
+
+    with framesLoad(['comp-pol'], rows) as dfs:
+        assert list(dfs['comp-pol'].index) == [keys[0]]
+        dfs['comp-pol'].at[keys[0], solvent] = 1.0
+    df = readFrame('comp-pol')
+    assert list(df.index) == list(keys)
+    assert df.at[keys[0], solvent] == 1.0
+
+    with pytest.raises(ValueError):
+        with framesLoad(['comp-pol'], rows) as dfs:
+            dfs['comp-pol'] = dfs['comp-pol'].drop(keys[0])
+    assert list(readFrame('comp-pol').index) == list(keys)
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+import resources as r
+
+pytest.importorskip('PyQt6')
+
+from manageDS.funcs.dfManipulation import add_metajobs, compFrames
+from sharedFuncs.storeFuncs import framePath, readFrame
+
+def test_add_metajobs_to_progress_and_comp_frames(db):
+    fluorophore, state, solvent = list(r.Fluorophores)[0], list(r.States)[0], list(r.Solvents)[0]
+    existing = list(r.MetaJobs)[0]
+    new = next(i for i in r.MetaJobs if i.job == existing.job and i != existing)
+    progress = pd.MultiIndex.from_tuples([(fluorophore, state, existing)], names=['Fluorophore', 'State', 'MetaJob'])
+    pd.DataFrame(None, index=progress, columns=[solvent], dtype=object).to_pickle(framePath('progress'))
+    comp = pd.MultiIndex.from_tuples([(fluorophore, state, existing, 'de')], names=['Fluorophore', 'State', 'MetaJob', 'Property'])
+    for db in compFrames:
+        pd.DataFrame(1.0, index=comp, columns=[solvent]).to_pickle(framePath(db))
+
+    add_metajobs([new])
+
+    assert (fluorophore, state, new) in readFrame('progress').index
+    for db in compFrames:
+        df = readFrame(db)
+        assert df.at[(fluorophore, state, new, 'de'), solvent] == 0.0
+        assert df.at[(fluorophore, state, existing, 'de'), solvent] == 1.0
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from sharedFuncs.resourceFuncs import ResourceModel, evaluate, historyColumns
+
+def make_history() -> pd.DataFrame:
+    # hours and mem scale with atoms**2 and atoms; 'opt' jobs (rank 'dft') ran on 4 cores,
+    # 'ex' jobs (rank 'tddft') on 16
+    rows = []
+    for metajob, rank, procs in [('opt', 'dft', 4), ('ex', 'tddft', 16)]:
+        for atoms in [10, 15, 20, 25, 30]:
+            rows += [('f', 's0', metajob, 'water', atoms, rank, True, procs, atoms/10, atoms**2/100)]
+    return pd.DataFrame(rows, columns=historyColumns)
+
+def test_estimate_follows_the_fit():
+    estimate = ResourceModel(make_history()).estimate(40, 'opt', 'dft', True)
+    assert estimate['procs'] == 4
+    assert 16 <= estimate['hours'] <= 17
+    assert 4 <= estimate['mem'] <= 5
+
+def test_fallback_order():
+    model = ResourceModel(make_history())
+    # own (metajob, solvated) group, then (rank, solvated), then everything
+    assert model.estimate(20, 'ex', 'dft', True)['procs'] == 16
+    assert model.estimate(20, 'freq', 'tddft', True)['procs'] == 16
+    assert model.estimate(20, 'freq', 'cas', True)['procs'] == 10
+    assert model.estimate(20, 'opt', 'dft', False)['procs'] == 10
+
+def test_no_estimate_without_history():
+    assert ResourceModel(pd.DataFrame(columns=historyColumns)).estimate(20, 'opt', 'dft', True) == None
+    assert ResourceModel(make_history()).estimate(None, 'opt', 'dft', True) == None
+
+def test_unusable_rows_are_ignored():
+    history = make_history()
+    history.loc[0, 'hours'] = 0
+    history.loc[1, 'mem'] = 0
+    # three usable 'opt' rows are too few for their own fit, leaving the 3:5 overall median
+    assert ResourceModel(history).estimate(20, 'opt', 'dft', True)['procs'] == 16
+    evaluate(history)
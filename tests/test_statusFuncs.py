@@ -0,0 +1,96 @@
+import shlex
+import types
+import resources as r
+
+from manageDS.funcs.statusFuncs import QueueSnapshot
+from sharedFuncs.clusterFuncs import ClusterSession
+from sharedFuncs.bundleFuncs import recordBundle, readBundles
+
+class FakeClusterHandler:
+    # stands in for r.clusterHandler: statuses are what checkJobStatus reads from each job's
+    # output and queue is the scheduler's listing, both keyed by job name. finished jobs have
+    # a normally terminated output in their directory
+    def __init__(self, statuses: dict[str, r.Status] = None, queue: dict[str, str] = None, accounting: str = ''):
+        self.statuses = {} if statuses == None else statuses
+        self.queue = {} if queue == None else queue
+        self.accounting = accounting
+        self.runs = []
+        self.calls = 0
+
+    def __call__(self, cluster_choice) -> 'FakeClusterHandler':
+        return self
+
+    def __enter__(self) -> 'FakeClusterHandler':
+        return self
+
+    def __exit__(self, a, b, c) -> None:
+        return
+
+    def checkJobStatus(self, job) -> r.Status | None:
+        self.calls += 1
+        return self.statuses.get(job.name)
+
+    def run(self, command: str) -> str:
+        self.runs += [command]
+        if command.startswith('if command -v sbatch'):
+            return 'slurm\n'
+        if command.startswith('squeue'):
+            return ''.join(f'{name}|{state}\n' for name, state in self.queue.items())
+        if command.startswith('sacct'):
+            return self.accounting
+        if command.startswith('for d in'):
+            directories = shlex.split(command[len('for d in '):command.index(';')])
+            return ''.join(f'{i}\n' for i in directories if self.statuses.get(i.rsplit('/', 1)[1]) == r.Status.finished)
+        raise AssertionError(command)
+
+def job(name: str):
+    return types.SimpleNamespace(name=name, path='/jobs')
+
+def test_queue_wins_over_output(db):
+    fake = FakeClusterHandler(statuses={'a': r.Status.failed}, queue={'a': 'RUNNING'})
+    with ClusterSession(None, fake) as clu:
+        snapshot = QueueSnapshot.from_session(clu, True)
+        assert snapshot.resolve(clu, job('a')) == r.Status.running
+    assert fake.calls == 0
+
+def test_falls_back_to_output(db):
+    fake = FakeClusterHandler(statuses={'a': r.Status.finished}, queue={'b': 'PENDING'})
+    with ClusterSession(None, fake) as clu:
+        snapshot = QueueSnapshot.from_session(clu, True)
+        assert snapshot.resolve(clu, job('b')) == r.Status.queued
+        assert snapshot.resolve(clu, job('a')) == r.Status.finished
+        assert snapshot.resolve(clu, job('c')) == None
+    assert fake.calls == 2
+
+def test_finished_outputs_listed_in_one_pass(db):
+    fake = FakeClusterHandler(statuses={'a': r.Status.finished, 'b': r.Status.finished, 'c': r.Status.failed}, queue={'b': 'PENDING'})
+    with ClusterSession(None, fake) as clu:
+        snapshot = QueueSnapshot.from_session(clu, True, [job('a'), job('b'), job('c')])
+        assert snapshot.resolve(clu, job('a')) == r.Status.finished
+        assert snapshot.resolve(clu, job('b')) == r.Status.queued
+        assert snapshot.resolve(clu, job('c')) == r.Status.failed
+    # only c, which didn't finish, goes to the per-job check; b is queued so its output isn't read
+    assert fake.calls == 1
+    listings = [i for i in fake.runs if i.startswith('for d in')]
+    assert len(listings) == 1 and '/jobs/b' not in listings[0]
+
+def test_no_snapshot_unless_asked(db):
+    with ClusterSession(None, FakeClusterHandler()) as clu:
+        assert QueueSnapshot.from_session(clu, False) == None
+
+def test_bundles_pruned_once_out_of_the_queue(db):
+    recordBundle(None, 'bundle-x', ['a', 'b'])
+    fake = FakeClusterHandler(statuses={'a': r.Status.finished}, queue={'bundle-x': 'RUNNING'})
+    with ClusterSession(None, fake) as clu:
+        assert QueueSnapshot.from_session(clu, False).resolve(clu, job('a')) == r.Status.running
+        fake.queue = {}
+        assert QueueSnapshot.from_session(clu, False).resolve(clu, job('a')) == r.Status.finished
+    assert readBundles(None) == {}
+
+def test_usage_from_one_accounting_listing(db):
+    accounting = ('101|a|FAILED|60|4|\n101.batch|batch|FAILED|60|4|1G\n'
+                  '102|a|COMPLETED|7200|8|\n102.batch|batch|COMPLETED|7200|8|2048M\n102.extern|extern|COMPLETED|7200|8|4K\n'
+                  '103|b|COMPLETED|3600|4|\n')
+    with ClusterSession(None, FakeClusterHandler(accounting=accounting)) as clu:
+        # b has no step with a memory figure, so there's nothing usable for it
+        assert clu.usageHistory() == {'a': {'hours': 2.0, 'mem': 2.0, 'procs': 8}}
@@ -0,0 +1,45 @@
+import os
+import pandas as pd
+import pytest
+import resources as r
+
+from sharedFuncs import columnStore
+from sharedFuncs.storeFuncs import framePath, readFrame, statusLoad, framesLoad, recordMeta, metaPath, indexSummary
+
+def make_progress() -> pd.DataFrame:
+    index = pd.MultiIndex.from_tuples([(list(r.Fluorophores)[0], list(r.States)[0], list(r.MetaJobs)[0])],
+                                      names=['Fluorophore', 'State', 'MetaJob'])
+    return pd.DataFrame(None, index=index, columns=list(r.Solvents), dtype=object)
+
+def test_pickled_frames_leave_no_column_store(db):
+    make_progress().to_pickle(framePath('progress'))
+    with framesLoad(['progress']):
+        pass
+    assert not os.path.exists(columnStore.dbPath())
+
+def test_statusLoad_keeps_changes_made_before_an_error(db):
+    make_progress().to_pickle(framePath('progress'))
+    key, solvent = make_progress().index[0], list(r.Solvents)[0]
+    with pytest.raises(RuntimeError):
+        with statusLoad(df='progress') as df:
+            df.at[key, solvent] = r.Status.queued
+            raise RuntimeError
+    assert readFrame('progress').at[key, solvent] == r.Status.queued
+
+def test_framesLoad_discards_changes_on_error(db):
+    make_progress().to_pickle(framePath('progress'))
+    key, solvent = make_progress().index[0], list(r.Solvents)[0]
+    with pytest.raises(RuntimeError):
+        with framesLoad(['progress']) as dfs:
+            dfs['progress'].at[key, solvent] = r.Status.queued
+            raise RuntimeError
+    assert pd.isna(readFrame('progress').at[key, solvent])
+
+def test_meta_left_alone_when_unchanged(db):
+    make_progress().to_pickle(framePath('progress'))
+    frames = {'progress': readFrame('progress')}
+    recordMeta(frames)
+    version = os.stat(metaPath()).st_mtime_ns
+    recordMeta(frames)
+    assert os.stat(metaPath()).st_mtime_ns == version
+    assert indexSummary(['progress'])['progress'][1] == [list(r.Fluorophores)[0]]